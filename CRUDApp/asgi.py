@@ -5,6 +5,19 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+ASGI deployment mode: set ``ASYNC_VIEWS = True`` in settings so the dashboard
+and access-request routes use ``website.async_views``, then serve this module
+with an ASGI server, e.g.::
+
+    uvicorn CRUDApp.asgi:application --workers 4
+    daphne CRUDApp.asgi:application
+
+In this mode a slow dashboard awaits its (concurrent) queries instead of
+holding a worker thread. Open dashboards also get live updates from
+``dashboard/events``, a Server-Sent Events stream that waits on the event
+loop rather than a thread. The remaining views are synchronous and are run
+in Django's thread pool as usual.
 """
 
 import os
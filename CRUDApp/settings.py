@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -49,6 +51,10 @@ CRISPY_TEMPLATE_PACK = "bootstrap5"
 
 
 MIDDLEWARE = [
+    # Answers static file requests before anything else runs (SERVE_STATIC)
+    'website.staticfiles.StaticFilesMiddleware',
+    # Next, so its timings cover the rest of the stack
+    'website.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -56,13 +62,15 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'website.routers.ReplicaPinMiddleware',
 ]
 
 ROOT_URLCONF = 'CRUDApp.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Django's backend, plus per-request render timing for the metrics
+        'BACKEND': 'website.metrics.TimedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -75,6 +83,21 @@ TEMPLATES = [
     },
 ]
 
+# Opt-in template tuning for production: set TEMPLATE_PROFILE=production.
+# Compiled templates are kept for the life of the process (edits need a
+# restart), and WebsiteConfig.ready() compiles the pages, the crispy form
+# layouts and the URL resolver at startup (see website/warmup.py), so the
+# first request after a deploy or worker fork is not the slow one.
+TEMPLATE_WARM_UP = os.environ.get('TEMPLATE_PROFILE') == 'production'
+if TEMPLATE_WARM_UP:
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
 WSGI_APPLICATION = 'CRUDApp.wsgi.application'
 
 
@@ -88,6 +111,87 @@ DATABASES = {
     }
 }
 
+# Opt-in SQLite tuning for production: set DB_PROFILE=production.
+# WAL lets readers carry on while a write is in progress, and IMMEDIATE
+# transactions take the write lock up front (see write_transaction in
+# website/concurrency.py), waiting up to busy_timeout instead of failing
+# with "database is locked". Connections are kept open between requests
+# and checked before reuse.
+if os.environ.get('DB_PROFILE') == 'production':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA busy_timeout=5000;'
+                'PRAGMA mmap_size=268435456;'  # 256 MiB
+                'PRAGMA cache_size=-20000;'  # ~20 MB per connection
+                'PRAGMA temp_store=MEMORY;'
+            ),
+        },
+    })
+
+# Read-only replicas for the dashboard, search and exports: set DB_REPLICAS
+# to a comma-separated list of SQLite files kept in sync with db.sqlite3
+# (e.g. by litestream or a periodic backup). A session that just wrote is
+# read from the primary for REPLICA_LAG_SECONDS. See website/routers.py.
+DATABASE_REPLICAS = []
+for number, path in enumerate(filter(None, os.environ.get('DB_REPLICAS', '').split(',')), start=1):
+    alias = f'replica{number}'
+    replica = {**DATABASES['default'], 'NAME': path.strip(), 'TEST': {'MIRROR': 'default'}}
+    options = dict(replica.get('OPTIONS', {}))
+    options['init_command'] = options.get('init_command', '') + 'PRAGMA query_only=ON;'
+    replica['OPTIONS'] = options
+    DATABASES[alias] = replica
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['website.routers.PrimaryReplicaRouter']
+REPLICA_LAG_SECONDS = 5
+
+# Cache backend, no external service needed: CACHE_BACKEND=file (default,
+# shared by every process on the host, at CACHE_LOCATION) or
+# CACHE_BACKEND=locmem (per process). The job runner is always a separate
+# process, and the dashboard only sees its fragment bumps through a shared
+# cache, so `manage.py run_jobs` refuses to start with locmem. Keep locmem
+# for a lone runserver without jobs. Hosts sharing one database need a
+# cache they all reach, such as Redis.
+if os.environ.get('CACHE_BACKEND') == 'locmem':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'crudapp',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'crudapp-cache')),
+        }
+    }
+
+# Sessions are read from the cache and written through to the database;
+# the logged-in user is cached too (see website/auth.py). Both only while
+# every process shares the cache: otherwise a logout, password change or
+# deactivation wouldn't reach the other processes' copies.
+if CACHES['default']['BACKEND'].endswith('.LocMemCache'):
+    SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+else:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+AUTHENTICATION_BACKENDS = ['website.auth.CachedModelBackend']
+USER_CACHE_TIMEOUT = 300
+
+# Login/register throttling (website/throttle.py). Rates are (attempts,
+# seconds) token buckets per client IP and, for logins, per username.
+# THROTTLE_LOCKOUT_FAILURES failed logins lock a username out for
+# THROTTLE_LOCKOUT_SECONDS.
+THROTTLE_IP_RATE = (20, 60)
+THROTTLE_USERNAME_RATE = (5, 60)
+THROTTLE_LOCKOUT_FAILURES = 10
+THROTTLE_LOCKOUT_SECONDS = 900
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -125,6 +229,35 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# Production static pipeline: set STATIC_PROFILE=production and run
+# `manage.py collectstatic`. Files get content-hashed names plus .gz/.br
+# variants, and the app serves them itself with far-future immutable
+# cache headers (website/staticfiles.py).
+SERVE_STATIC = os.environ.get('STATIC_PROFILE') == 'production'
+if SERVE_STATIC:
+    STORAGES = {
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'website.staticfiles.CompressedManifestStaticFilesStorage'},
+    }
+
+# Background jobs (website/jobs.py), run by `manage.py run_jobs`. Uploads
+# and finished exports are kept in JOB_FILES_DIR. A failed job is retried
+# after JOB_RETRY_DELAY seconds, doubling each time, up to JOB_MAX_ATTEMPTS
+# attempts; a running job silent for JOB_LEASE_SECONDS is queued again.
+JOB_FILES_DIR = BASE_DIR / 'jobfiles'
+JOB_WORKER_THREADS = 4
+JOB_MAX_ATTEMPTS = 3
+JOB_RETRY_DELAY = 10
+JOB_LEASE_SECONDS = 600
+
+# Deleting a user removes (or reassigns) their clients and records
+# DELETE_BATCH_SIZE rows per transaction, pausing DELETE_BATCH_PAUSE
+# seconds between batches so other writers are not locked out
+# (website/deletion.py).
+DELETE_BATCH_SIZE = 1000
+DELETE_BATCH_PAUSE = 0.05
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -134,3 +267,27 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Feature flags
 # When True, only staff users can access the dashboard and related management views
 DASHBOARD_STAFF_ONLY = False
+# When True, the dashboard and access-request routes use the async views in
+# website/async_views.py. Enable this when serving CRUDApp.asgi:application.
+# It also turns on live dashboard updates over Server-Sent Events
+# (website/events.py): streams send a comment every EVENTS_HEARTBEAT_SECONDS
+# while idle, and each process checks for changes made by other processes
+# every EVENTS_POLL_SECONDS while anyone is watching.
+ASYNC_VIEWS = False
+EVENTS_HEARTBEAT_SECONDS = 20
+EVENTS_POLL_SECONDS = 5
+
+# Dashboard tables are keyset-paginated; `?<table>_size=` is clamped to the max
+DASHBOARD_PAGE_SIZE = 25
+DASHBOARD_MAX_PAGE_SIZE = 100
+# The JSON API (website/api.py) pages the same way with `?size=`
+API_PAGE_SIZE = 100
+API_MAX_PAGE_SIZE = 1000
+
+# Seconds a rendered dashboard table stays cached. Tables are invalidated by
+# signals, so this only bounds staleness when several processes do not share
+# a cache backend.
+DASHBOARD_FRAGMENT_TIMEOUT = 300
+
+# /metrics is staff-only; scrapers may instead send "Authorization: Bearer <token>"
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
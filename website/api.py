@@ -0,0 +1,461 @@
+"""JSON API over users, clients, records and access requests.
+
+Every endpoint needs a logged-in staff session, and writes need the CSRF
+token, just like the HTML forms. Role changes and access requests follow
+the dashboard's superuser rules. Lists are keyset-paginated (``?sort=``,
+``?size=``, and the ``next``/``previous`` links) and take filters from
+the resource's filter form. Both lists and single objects take
+``?fields=a,b`` to load and return only those columns. GET responses
+carry an ETag of their body and answer a matching ``If-None-Match`` with
+304.
+
+Writes accept a JSON object (POST also accepts form data) and are
+validated with the same model forms as the HTML views. Deleting a user
+queues a background job (``202 Accepted``, ``Location`` is the job page);
+``?reassign_to=<id>`` keeps their clients and records under that user.
+"""
+import hashlib
+import json
+from functools import wraps
+from operator import attrgetter
+
+from django.conf import settings
+from django.contrib.auth import logout
+from django.contrib.auth.models import User
+from django.forms.models import model_to_dict
+from django.http import HttpResponse, JsonResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from . import bulk, jobs
+from .concurrency import write_transaction
+from .forms import (
+    AccessRequestFilterForm, AdminCreateUserForm, ClientFilterForm, ClientForm, RecordFilterForm,
+    RecordForm, UserEditForm, UserFilterForm,
+)
+from .models import AccessRequest, Client, Record
+from .pagination import KeysetPaginator
+from .routers import read_replica
+
+
+class ApiError(Exception):
+    def __init__(self, status, message, errors=None):
+        super().__init__(message)
+        self.status = status
+        self.errors = errors
+
+    def response(self):
+        body = {'error': str(self)}
+        if self.errors:
+            body['errors'] = self.errors
+        return JsonResponse(body, status=self.status)
+
+
+def _avatar(user):
+    try:
+        return user.profile.avatar
+    except AttributeError:  # no profile yet
+        return None
+
+
+class Resource:
+    """How a model is exposed: its fields, sort orders and filters.
+
+    ``fields`` maps each API field to ``(column, getter)``. The column is
+    what ``.only()`` loads for it (a ``relation__column`` path also joins
+    the relation), and the getter reads the value off an object.
+    """
+
+    def __init__(self, model, fields, sort_fields, default_sort, filter_form, detail_url):
+        self.model = model
+        self.fields = fields
+        self.sort_fields = sort_fields
+        self.default_sort = default_sort
+        self.filter_form = filter_form
+        self.detail_url = detail_url
+
+    def field_names(self, request):
+        raw = request.GET.get('fields')
+        if not raw:
+            return list(self.fields)
+        names = [name.strip() for name in raw.split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ApiError(400, f'Unknown fields: {", ".join(unknown)}. Available: {", ".join(self.fields)}.')
+        # Cursors and Location headers need the id anyway
+        return names if 'id' in names else ['id'] + names
+
+    def queryset(self, names, *extra_columns):
+        columns = {self.fields[name][0] for name in names} | set(extra_columns)
+        qs = self.model.objects.only(*columns)
+        related = {column.rsplit('__', 1)[0] for column in columns if '__' in column}
+        # select_related() with no arguments would join every relation
+        return qs.select_related(*related) if related else qs
+
+    def serialize(self, obj, names=None):
+        return {name: self.fields[name][1](obj) for name in names or self.fields}
+
+
+USERS = Resource(
+    User,
+    {
+        'id': ('id', attrgetter('pk')),
+        'username': ('username', attrgetter('username')),
+        'first_name': ('first_name', attrgetter('first_name')),
+        'last_name': ('last_name', attrgetter('last_name')),
+        'email': ('email', attrgetter('email')),
+        'is_staff': ('is_staff', attrgetter('is_staff')),
+        'is_superuser': ('is_superuser', attrgetter('is_superuser')),
+        'date_joined': ('date_joined', attrgetter('date_joined')),
+        'last_login': ('last_login', attrgetter('last_login')),
+        'avatar': ('profile__avatar', _avatar),
+    },
+    {'joined': 'date_joined', 'username': 'username', 'email': 'email'}, '-joined',
+    UserFilterForm, 'api_user_detail',
+)
+CLIENTS = Resource(
+    Client,
+    {
+        'id': ('id', attrgetter('pk')),
+        'name': ('name', attrgetter('name')),
+        'company': ('company', attrgetter('company')),
+        'email': ('email', attrgetter('email')),
+        'phone': ('phone', attrgetter('phone')),
+        'notes': ('notes', attrgetter('notes')),
+        'created_by': ('created_by', attrgetter('created_by_id')),
+        'created_at': ('created_at', attrgetter('created_at')),
+        'updated_at': ('updated_at', attrgetter('updated_at')),
+    },
+    {'added': 'created_at', 'updated': 'updated_at', 'name': 'name', 'company': 'company', 'email': 'email'},
+    '-added', ClientFilterForm, 'api_client_detail',
+)
+RECORDS = Resource(
+    Record,
+    {
+        'id': ('id', attrgetter('pk')),
+        'title': ('title', attrgetter('title')),
+        'description': ('description', attrgetter('description')),
+        'created_by': ('created_by', attrgetter('created_by_id')),
+        'created_at': ('created_at', attrgetter('created_at')),
+        'updated_at': ('updated_at', attrgetter('updated_at')),
+    },
+    {'added': 'created_at', 'updated': 'updated_at', 'title': 'title'}, '-added',
+    RecordFilterForm, 'api_record_detail',
+)
+ACCESS_REQUESTS = Resource(
+    AccessRequest,
+    {
+        'id': ('id', attrgetter('pk')),
+        'user': ('user', attrgetter('user_id')),
+        'username': ('user__username', attrgetter('user.username')),
+        'status': ('status', attrgetter('status')),
+        'note': ('note', attrgetter('note')),
+        'created_at': ('created_at', attrgetter('created_at')),
+        'responded_at': ('responded_at', attrgetter('responded_at')),
+        'updated_at': ('updated_at', attrgetter('updated_at')),
+    },
+    {'created': 'created_at', 'updated': 'updated_at'}, '-created',
+    AccessRequestFilterForm, 'api_access_request_detail',
+)
+
+
+def _json(request, data, status=200):
+    response = JsonResponse(data, status=status, json_dumps_params={'separators': (',', ':')})
+    if request.method in ('GET', 'HEAD') and status == 200:
+        etag = f'"{hashlib.md5(response.content, usedforsecurity=False).hexdigest()}"'
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        response = get_conditional_response(request, etag=etag, response=response)
+    return response
+
+
+def _not_allowed(*methods):
+    response = JsonResponse({'error': 'Method not allowed.'}, status=405)
+    response['Allow'] = ', '.join(methods)
+    return response
+
+
+def staff_api(view):
+    """Require a staff session, answering with JSON errors instead of redirects."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Authentication required.'}, status=401)
+        if not request.user.is_staff:
+            return JsonResponse({'error': 'This action is restricted to staff users.'}, status=403)
+        try:
+            return view(request, *args, **kwargs)
+        except ApiError as exc:
+            return exc.response()
+    return wrapper
+
+
+def _require_superuser(request, message):
+    if not request.user.is_superuser:
+        raise ApiError(403, message)
+
+
+def _payload(request, writable):
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            raise ApiError(400, 'Request body is not valid JSON.')
+        if not isinstance(data, dict):
+            raise ApiError(400, 'Request body must be a JSON object.')
+    else:
+        data = request.POST.dict()
+    unknown = sorted(set(data) - set(writable))
+    if unknown:
+        raise ApiError(400, f'Unknown or read-only fields: {", ".join(unknown)}.')
+    return data
+
+
+def _flag(data, name):
+    value = data.get(name, False)
+    if isinstance(value, str):  # form data
+        value = {'true': True, 'on': True, '1': True, 'false': False, '0': False, '': False}.get(value.lower(), value)
+    if not isinstance(value, bool):
+        raise ApiError(400, f'{name} must be true or false.')
+    return value
+
+
+def _validate(form):
+    if not form.is_valid():
+        raise ApiError(400, 'Invalid data.', form.errors.get_json_data())
+    return form
+
+
+def _bind(form_class, instance, data):
+    # A PATCH only names the fields it changes; the rest keep their values
+    merged = model_to_dict(instance, fields=form_class._meta.fields)
+    merged.update(data)
+    return _validate(form_class(merged, instance=instance))
+
+
+def _get(resource, pk, names=None):
+    qs = resource.queryset(names) if names else resource.model.objects.all()
+    obj = qs.filter(pk=pk).first()
+    if obj is None:
+        raise ApiError(404, 'Not found.')
+    return obj
+
+
+def _created(request, resource, obj):
+    response = _json(request, resource.serialize(obj), status=201)
+    response['Location'] = reverse(resource.detail_url, args=[obj.pk])
+    return response
+
+
+@read_replica
+def _list(request, resource):
+    names = resource.field_names(request)
+    form = resource.filter_form(request.GET)
+    if not form.is_valid():
+        raise ApiError(400, 'Invalid filters.', form.errors.get_json_data())
+    paginator = KeysetPaginator(
+        resource.model.objects.all(), '', resource.sort_fields, resource.default_sort,
+        default_size=getattr(settings, 'API_PAGE_SIZE', 100),
+        max_size=getattr(settings, 'API_MAX_PAGE_SIZE', 1000),
+    )
+    # Load only the requested columns, plus the one the cursors are built from
+    paginator.queryset = resource.queryset(names, paginator.sort_field(request.GET)).filter(**form.filters())
+    page = paginator.paginate(request.GET)
+    return _json(request, {
+        'results': [resource.serialize(obj, names) for obj in page],
+        'next': request.build_absolute_uri(request.path + page.next_url) if page.next_url else None,
+        'previous': request.build_absolute_uri(request.path + page.previous_url) if page.previous_url else None,
+    })
+
+
+@read_replica
+def _detail(request, resource, pk):
+    names = resource.field_names(request)
+    return _json(request, resource.serialize(_get(resource, pk, names), names))
+
+
+def _delete(request, resource, pk):
+    _get(resource, pk).delete()
+    return HttpResponse(status=204)
+
+
+# Users
+
+USER_WRITABLE = ('username', 'first_name', 'last_name', 'email', 'is_staff', 'is_superuser')
+
+
+def _create_user(request):
+    data = _payload(request, USER_WRITABLE + ('password1', 'password2'))
+    is_superuser = _flag(data, 'is_superuser')
+    if is_superuser:
+        _require_superuser(request, 'Only superusers can create superusers.')
+    user = _validate(AdminCreateUserForm(data)).save(commit=False)
+    user.is_superuser = is_superuser
+    user.is_staff = user.is_staff or is_superuser  # superusers are implicitly staff
+    user.save()
+    return _created(request, USERS, user)
+
+
+def _update_user(request, pk):
+    data = _payload(request, USER_WRITABLE)
+    usr = _get(USERS, pk)
+    is_superuser = _flag(data, 'is_superuser') if 'is_superuser' in data else usr.is_superuser
+    if is_superuser != usr.is_superuser:
+        _require_superuser(request, 'Only superusers can change superuser status.')
+        if not is_superuser and not User.objects.filter(is_superuser=True).exclude(pk=usr.pk).exists():
+            raise ApiError(409, 'Cannot remove superuser status from the last superuser.')
+    if 'is_staff' in data and _flag(data, 'is_staff') != usr.is_staff and usr.is_superuser:
+        _require_superuser(request, 'Admins cannot modify superuser roles.')
+    data.pop('is_superuser', None)
+    usr = _bind(UserEditForm, usr, data).save(commit=False)
+    usr.is_superuser = is_superuser
+    usr.is_staff = usr.is_staff or is_superuser
+    usr.save()
+    return _json(request, USERS.serialize(usr))
+
+
+def _delete_user(request, pk):
+    usr = _get(USERS, pk)
+    if usr.is_superuser:
+        _require_superuser(request, 'Only superusers can delete superusers.')
+        if not User.objects.filter(is_superuser=True).exclude(pk=usr.pk).exists():
+            raise ApiError(409, 'Cannot delete the last superuser.')
+    payload = {'user_id': usr.pk, 'username': usr.username}
+    if 'reassign_to' in request.GET:
+        # Hand their clients and records to another user instead of deleting them
+        target = request.GET['reassign_to']
+        target = User.objects.exclude(pk=usr.pk).filter(pk=target).first() if target.isdigit() else None
+        if target is None:
+            raise ApiError(400, 'reassign_to must be the id of another user.')
+        payload['reassign_to'] = target.pk
+    # As in the dashboard: sign them out now, delete their rows in the worker
+    usr.is_active = False
+    usr.save(update_fields=['is_active'])
+    job = jobs.enqueue('delete_user', payload, user=request.user)
+    if usr.pk == request.user.pk:
+        logout(request)
+    response = _json(request, {'job': job.pk, 'status': job.status}, status=202)
+    response['Location'] = reverse('job_detail', args=[job.pk])
+    return response
+
+
+@staff_api
+@write_transaction
+def user_list(request):
+    if request.method == 'GET':
+        return _list(request, USERS)
+    if request.method == 'POST':
+        return _create_user(request)
+    return _not_allowed('GET', 'POST')
+
+
+@staff_api
+@write_transaction
+def user_detail(request, pk):
+    if request.method == 'GET':
+        return _detail(request, USERS, pk)
+    if request.method == 'PATCH':
+        return _update_user(request, pk)
+    if request.method == 'DELETE':
+        return _delete_user(request, pk)
+    return _not_allowed('GET', 'PATCH', 'DELETE')
+
+
+# Clients and records
+
+def _create_owned(request, resource, form_class):
+    data = _payload(request, form_class._meta.fields)
+    obj = _validate(form_class(data)).save(commit=False)
+    obj.created_by = request.user
+    obj.save()
+    return _created(request, resource, obj)
+
+
+def _update_owned(request, resource, form_class, pk):
+    data = _payload(request, form_class._meta.fields)
+    obj = _bind(form_class, _get(resource, pk), data).save()
+    return _json(request, resource.serialize(obj))
+
+
+@staff_api
+@write_transaction
+def client_list(request):
+    if request.method == 'GET':
+        return _list(request, CLIENTS)
+    if request.method == 'POST':
+        return _create_owned(request, CLIENTS, ClientForm)
+    return _not_allowed('GET', 'POST')
+
+
+@staff_api
+@write_transaction
+def client_detail(request, pk):
+    if request.method == 'GET':
+        return _detail(request, CLIENTS, pk)
+    if request.method == 'PATCH':
+        return _update_owned(request, CLIENTS, ClientForm, pk)
+    if request.method == 'DELETE':
+        return _delete(request, CLIENTS, pk)
+    return _not_allowed('GET', 'PATCH', 'DELETE')
+
+
+@staff_api
+@write_transaction
+def record_list(request):
+    if request.method == 'GET':
+        return _list(request, RECORDS)
+    if request.method == 'POST':
+        return _create_owned(request, RECORDS, RecordForm)
+    return _not_allowed('GET', 'POST')
+
+
+@staff_api
+@write_transaction
+def record_detail(request, pk):
+    if request.method == 'GET':
+        return _detail(request, RECORDS, pk)
+    if request.method == 'PATCH':
+        return _update_owned(request, RECORDS, RecordForm, pk)
+    if request.method == 'DELETE':
+        return _delete(request, RECORDS, pk)
+    return _not_allowed('GET', 'PATCH', 'DELETE')
+
+
+# Access requests (superusers only, as on the dashboard)
+
+@staff_api
+def access_request_list(request):
+    if request.method != 'GET':
+        return _not_allowed('GET')
+    _require_superuser(request, 'Only superusers can review access requests.')
+    return _list(request, ACCESS_REQUESTS)
+
+
+@staff_api
+def access_request_detail(request, pk):
+    if request.method != 'GET':
+        return _not_allowed('GET')
+    _require_superuser(request, 'Only superusers can review access requests.')
+    return _detail(request, ACCESS_REQUESTS, pk)
+
+
+def _review(request, pk, handler, message):
+    if request.method != 'POST':
+        return _not_allowed('POST')
+    _require_superuser(request, message)
+    # The bulk handlers keep the counters, caches and profiles in step
+    if not handler(request.user, [pk]):
+        raise ApiError(404, 'No pending access request with that id.')
+    return _json(request, ACCESS_REQUESTS.serialize(_get(ACCESS_REQUESTS, pk)))
+
+
+@staff_api
+@write_transaction
+def access_request_approve(request, pk):
+    return _review(request, pk, bulk.approve_requests, 'Only superusers can approve access requests.')
+
+
+@staff_api
+@write_transaction
+def access_request_deny(request, pk):
+    return _review(request, pk, bulk.deny_requests, 'Only superusers can deny access requests.')
@@ -1,4 +1,5 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class WebsiteConfig(AppConfig):
@@ -8,3 +9,12 @@ class WebsiteConfig(AppConfig):
     def ready(self):
         # Import signals to attach user post_save handlers
         from . import signals  # noqa: F401
+        # Connect the query recorder before any connection is opened
+        from . import metrics  # noqa: F401
+        # Register the background job handlers
+        from . import tasks  # noqa: F401
+        # Feed fragment invalidations to the live dashboard streams
+        from . import events  # noqa: F401
+        if getattr(settings, 'TEMPLATE_WARM_UP', False):
+            from .warmup import warm_up
+            warm_up()
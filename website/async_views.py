@@ -0,0 +1,146 @@
+"""Async versions of the dashboard and access-request views.
+
+Routed instead of their counterparts in ``views`` when ``ASYNC_VIEWS`` is
+enabled (see ``CRUDApp/asgi.py``), along with the live dashboard's event
+stream and table refresh, which only exist in that mode. Under an ASGI server they wait on the
+database without holding a worker thread, and the dashboard issues its
+independent reads concurrently.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.db import IntegrityError, transaction
+from django.http import HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, redirect, render
+from django.utils import timezone
+
+from . import events, fragments
+from .concurrency import gather_sync
+from .conditional import conditional_page
+from .models import AccessRequest
+from .routers import read_replica
+from .views import _action_response, _dashboard_context, _dashboard_counts, _dashboard_fragments, _pending_count
+
+
+@login_required(login_url='login')
+@read_replica
+@conditional_page
+async def dashboard(request):
+    user = await request.auser()
+    if not user.is_staff:
+        existing = await AccessRequest.objects.filter(user=user, status=AccessRequest.STATUS_PENDING).afirst()
+        return await sync_to_async(render)(request, 'pages/dashboard_request.html', {
+            'has_pending': bool(existing),
+            'pending_request': existing,
+        })
+    # Counters and every uncached table are read at the same time
+    (counts,), tables = await asyncio.gather(
+        gather_sync(_dashboard_counts),
+        fragments.arender_fragments(request, _dashboard_fragments(request, user)),
+    )
+    context = _dashboard_context(user, counts)
+    context.update(tables)
+    return await sync_to_async(render)(request, 'pages/dashboard.html', context)
+
+
+@login_required(login_url='login')
+async def dashboard_events(request):
+    """Server-Sent Events telling an open dashboard which tables changed.
+
+    Each connection waits on the event loop (see ``website.events``), so
+    thousands of idle dashboards hold no threads.
+    """
+    user = await request.auser()
+    if not user.is_staff:
+        return HttpResponseForbidden('This action is restricted to staff users.')
+    response = StreamingHttpResponse(events.stream(user), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Don't let a reverse proxy buffer the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@login_required(login_url='login')
+@read_replica
+async def dashboard_tables(request):
+    """Re-render the dashboard tables that depend on ``?changed=`` as JSON.
+
+    The live dashboard calls this with its own query string after a change
+    event. The tables come from the same fragment cache as the page, so
+    every viewer after the first gets them without a query.
+    """
+    user = await request.auser()
+    if not user.is_staff:
+        return JsonResponse({'error': 'This action is restricted to staff users.'}, status=403)
+    params = request.GET.copy()
+    changed = set(params.pop('changed', []))
+    wanted = [f for f in _dashboard_fragments(request, user, params) if changed.intersection(f.depends_on)]
+    return JsonResponse({'tables': await fragments.arender_fragments(request, wanted)})
+
+
+@login_required(login_url='login')
+async def request_dashboard_access(request):
+    # Allow any authenticated user to request access
+    user = await request.auser()
+    if user.is_staff:
+        return redirect('dashboard')
+    ar = await AccessRequest.objects.filter(user=user, status=AccessRequest.STATUS_PENDING).afirst()
+    if not ar:
+        try:
+            await AccessRequest.objects.acreate(user=user, status=AccessRequest.STATUS_PENDING)
+        except IntegrityError:
+            # A concurrent submit won the one-pending-request-per-user constraint
+            return redirect('dashboard')
+        messages.info(request, 'Access request submitted. An admin will review it shortly.')
+    return redirect('dashboard')
+
+
+@sync_to_async
+def _respond(ar, status):
+    """Approve or deny ``ar`` in one transaction; returns the new pending count.
+
+    Approving also makes the user staff, and both writes must land
+    together, as they do in ``views.approve_access_request``.
+    """
+    with transaction.atomic():
+        if status == AccessRequest.STATUS_APPROVED:
+            ar.user.is_staff = True
+            ar.user.save(update_fields=['is_staff'])
+        ar.status = status
+        ar.responded_at = timezone.now()
+        # auto_now only reaches the row when listed
+        ar.save(update_fields=['status', 'responded_at', 'updated_at'])
+    return _pending_count()
+
+
+@login_required(login_url='login')
+async def approve_access_request(request, pk):
+    if request.method != 'POST':
+        return redirect('dashboard')
+    user = await request.auser()
+    if not user.is_superuser:
+        return _action_response(request, messages.ERROR, 'Only superusers can approve access requests.', status=403)
+    ar = await aget_object_or_404(
+        AccessRequest.objects.select_related('user'), pk=pk, status=AccessRequest.STATUS_PENDING,
+    )
+    u = ar.user
+    pending = await _respond(ar, AccessRequest.STATUS_APPROVED)
+    return _action_response(request, messages.SUCCESS, f'Granted dashboard access to {u.username}.',
+                            user=u.pk, is_staff=True, pending=pending)
+
+
+@login_required(login_url='login')
+async def deny_access_request(request, pk):
+    if request.method != 'POST':
+        return redirect('dashboard')
+    user = await request.auser()
+    if not user.is_superuser:
+        return _action_response(request, messages.ERROR, 'Only superusers can deny access requests.', status=403)
+    ar = await aget_object_or_404(
+        AccessRequest.objects.select_related('user'), pk=pk, status=AccessRequest.STATUS_PENDING,
+    )
+    pending = await _respond(ar, AccessRequest.STATUS_DENIED)
+    return _action_response(request, messages.INFO, f'Denied dashboard access for {ar.user.username}.',
+                            pending=pending)
@@ -0,0 +1,52 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from . import caching
+
+
+def _key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def _timeout():
+    return getattr(settings, 'USER_CACHE_TIMEOUT', 300)
+
+
+def invalidate_users(*user_ids):
+    """Drop cached users so their next request reloads them from the database."""
+    cache.delete_many([_key(pk) for pk in user_ids])
+
+
+class CachedModelBackend(ModelBackend):
+    """``ModelBackend`` that keeps the per-request user lookup in the cache.
+
+    Together with ``cached_db`` sessions, a warm authenticated request needs
+    no auth queries. Cached users are dropped whenever a user is saved or
+    deleted (see ``signals.py``) and by bulk updates that skip signals.
+    That only reaches every process through a shared cache, so with a
+    per-process one users are loaded from the database each time.
+    """
+
+    def get_user(self, user_id):
+        if not caching.is_shared():
+            return super().get_user(user_id)
+        key = _key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, _timeout())
+        return user
+
+    async def aget_user(self, user_id):
+        if not caching.is_shared():
+            return await sync_to_async(super().get_user)(user_id)
+        key = _key(user_id)
+        user = await cache.aget(key)
+        if user is None:
+            user = await sync_to_async(super().get_user)(user_id)
+            if user is not None:
+                await cache.aset(key, user, _timeout())
+        return user
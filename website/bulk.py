@@ -0,0 +1,158 @@
+"""Multi-row dashboard actions, each run as set-based statements.
+
+Every action runs in one transaction and touches its rows with
+``UPDATE ... WHERE id IN (...)`` or ``DELETE ... WHERE id IN (...)`` in
+chunks of ``BATCH_SIZE`` ids. These statements skip the model signals, so
+each action adjusts the counters and dashboard fragments itself.
+"""
+from django.contrib.auth.models import User
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from . import counters, fragments
+from .auth import invalidate_users
+from .models import AccessRequest, Client, Record, UserProfile
+
+BATCH_SIZE = 500
+
+
+class BulkActionError(Exception):
+    """Raised when an action would break a safety rule; nothing is changed."""
+
+
+def _chunks(ids):
+    ids = sorted(set(ids))
+    for start in range(0, len(ids), BATCH_SIZE):
+        yield ids[start:start + BATCH_SIZE]
+
+
+def _touch_profiles(user_ids, now):
+    # Stands in for signals.touch_profile, so the users' changes show in
+    # the dashboard's Last-Modified
+    UserProfile.objects.filter(user_id__in=user_ids).update(updated_at=now)
+
+
+def set_staff(actor, ids, is_staff):
+    """Set ``is_staff`` on the given users and return how many changed.
+
+    As with the single-row toggle, staff who are not superusers cannot
+    change superusers; those rows are left alone.
+    """
+    updated = 0
+    now = timezone.now()
+    with transaction.atomic():
+        for chunk in _chunks(ids):
+            qs = User.objects.filter(pk__in=chunk).exclude(is_staff=is_staff)
+            if not actor.is_superuser:
+                qs = qs.exclude(is_superuser=True)
+            updated += qs.update(is_staff=is_staff)
+            _touch_profiles(chunk, now)
+        transaction.on_commit(lambda: fragments.bump(fragments.USERS))
+        transaction.on_commit(lambda: invalidate_users(*ids))
+    return updated
+
+
+def set_superuser(actor, ids, is_superuser):
+    """Set ``is_superuser`` on the given users and return how many changed.
+
+    Granting also grants staff. Revoking is refused outright if it would
+    leave no superuser at all.
+    """
+    updated = 0
+    now = timezone.now()
+    with transaction.atomic():
+        if not is_superuser and not User.objects.filter(is_superuser=True).exclude(pk__in=ids).exists():
+            raise BulkActionError('Cannot remove superuser status from the last superuser.')
+        for chunk in _chunks(ids):
+            qs = User.objects.filter(pk__in=chunk).exclude(is_superuser=is_superuser)
+            if is_superuser:
+                updated += qs.update(is_superuser=True, is_staff=True)
+            else:
+                updated += qs.update(is_superuser=False)
+            _touch_profiles(chunk, now)
+        transaction.on_commit(lambda: fragments.bump(fragments.USERS))
+        transaction.on_commit(lambda: invalidate_users(*ids))
+    return updated
+
+
+def delete_rows(model, pks):
+    """Delete the ``model`` rows with these primary keys in one statement.
+
+    For clients and records only. ``QuerySet.delete()`` would have the
+    collector load every row and send ``post_delete`` for each one. Skipping
+    that is safe because nothing references these rows, and their
+    ``post_delete`` handlers (``signals.count_deleted`` and
+    ``signals.invalidate_fragments``) only adjust the dashboard counter and
+    bump its fragment. Every caller does that itself: ``counters.adjust()``
+    in the same transaction and ``fragments.bump()`` on commit. The FTS
+    index follows through its delete triggers.
+
+    Returns the number of rows deleted.
+    """
+    if not pks:
+        return 0
+    connection = connections[router.db_for_write(model)]
+    table = connection.ops.quote_name(model._meta.db_table)
+    column = connection.ops.quote_name(model._meta.pk.column)
+    placeholders = ', '.join(['%s'] * len(pks))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE {column} IN ({placeholders})', list(pks))
+        return cursor.rowcount
+
+
+def _delete(model, counter, fragment, ids):
+    deleted = 0
+    with transaction.atomic():
+        for chunk in _chunks(ids):
+            deleted += delete_rows(model, chunk)
+        counters.adjust(counter, -deleted)
+        transaction.on_commit(lambda: fragments.bump(fragment))
+    return deleted
+
+
+def delete_clients(actor, ids):
+    return _delete(Client, counters.CLIENTS, fragments.CLIENTS, ids)
+
+
+def delete_records(actor, ids):
+    return _delete(Record, counters.RECORDS, fragments.RECORDS, ids)
+
+
+def _respond(ids, status, grant_staff):
+    responded = 0
+    now = timezone.now()
+    granted = []
+    with transaction.atomic():
+        for chunk in _chunks(ids):
+            pending = AccessRequest.objects.filter(pk__in=chunk, status=AccessRequest.STATUS_PENDING)
+            if grant_staff:
+                user_ids = list(pending.values_list('user_id', flat=True))
+                User.objects.filter(pk__in=user_ids).update(is_staff=True)
+                _touch_profiles(user_ids, now)
+                granted += user_ids
+            responded += pending.update(status=status, responded_at=now, updated_at=now)
+        counters.adjust(counters.PENDING_ACCESS, -responded)
+        transaction.on_commit(lambda: fragments.bump(fragments.USERS, fragments.ACCESS))
+        transaction.on_commit(lambda: invalidate_users(*granted))
+    return responded
+
+
+def approve_requests(actor, ids):
+    return _respond(ids, AccessRequest.STATUS_APPROVED, grant_staff=True)
+
+
+def deny_requests(actor, ids):
+    return _respond(ids, AccessRequest.STATUS_DENIED, grant_staff=False)
+
+
+# action name -> (handler, superuser only, success message)
+ACTIONS = {
+    'users_set_staff': (lambda actor, ids: set_staff(actor, ids, True), False, 'Granted staff status to {count} user(s).'),
+    'users_revoke_staff': (lambda actor, ids: set_staff(actor, ids, False), False, 'Revoked staff status from {count} user(s).'),
+    'users_set_superuser': (lambda actor, ids: set_superuser(actor, ids, True), True, 'Granted superuser status to {count} user(s).'),
+    'users_revoke_superuser': (lambda actor, ids: set_superuser(actor, ids, False), True, 'Revoked superuser status from {count} user(s).'),
+    'clients_delete': (delete_clients, False, 'Removed {count} client(s).'),
+    'records_delete': (delete_records, False, 'Removed {count} record(s).'),
+    'access_approve': (approve_requests, True, 'Granted dashboard access to {count} user(s).'),
+    'access_deny': (deny_requests, True, 'Denied {count} access request(s).'),
+}
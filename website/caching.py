@@ -0,0 +1,12 @@
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+
+def is_shared():
+    """Whether other processes see what this one writes to the default cache.
+
+    ``LocMemCache`` lives inside one process, so a fragment bump or user
+    invalidation made by the job runner or another web worker never
+    reaches this one.
+    """
+    return not isinstance(caches['default'], LocMemCache)
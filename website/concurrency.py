@@ -0,0 +1,48 @@
+import asyncio
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db import connections, transaction
+
+
+def _with_own_connection(func):
+    def run():
+        try:
+            return func()
+        finally:
+            # Worker threads are pooled; don't leave their connections open
+            connections.close_all()
+    return run
+
+
+async def gather_sync(*funcs):
+    """Run blocking ORM callables concurrently and return their results in order.
+
+    Django's async ORM methods all funnel through one shared thread, so
+    awaiting them in ``asyncio.gather`` still runs the queries one after
+    another. Each callable here gets its own worker thread and therefore its
+    own database connection, so independent reads really overlap.
+    """
+    return await asyncio.gather(*(
+        sync_to_async(_with_own_connection(func), thread_sensitive=False)()
+        for func in funcs
+    ))
+
+
+def write_transaction(view):
+    """Run a view's POST (or other unsafe method) handling in one transaction.
+
+    The view's reads and writes then commit together. With the production
+    SQLite profile (``transaction_mode = IMMEDIATE``) the transaction takes
+    the write lock when it begins. A deferred transaction only asks for it
+    at the first write, and can fail with "database is locked" when another
+    writer got there first; this one waits out ``busy_timeout`` instead.
+    GET requests only render a form, so they run outside any transaction.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method in ('GET', 'HEAD', 'OPTIONS'):
+            return view(request, *args, **kwargs)
+        with transaction.atomic():
+            return view(request, *args, **kwargs)
+    return wrapper
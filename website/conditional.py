@@ -0,0 +1,139 @@
+"""Conditional GET for the dashboard and search pages.
+
+``conditional_page`` computes a fingerprint of everything those pages
+show, then answers ``If-None-Match`` / ``If-Modified-Since`` with
+``304 Not Modified`` before the view runs. The fingerprint is:
+
+* the newest ``updated_at`` of each table (an index lookup each),
+* the dashboard counters and their ``updated_at``, which change on every
+  create and delete,
+* the versions of the cached dashboard fragments, so a body built from
+  a fragment is never sent under a fingerprint it doesn't match,
+* the viewer's id and role flags, and their CSRF cookie, so a re-used
+  page never carries a stale token,
+* a release token built from the templates, so a deploy invalidates every
+  page.
+
+All of it is read with one query and one cache lookup. Pages with pending
+flash messages are never answered with a 304, since the messages would
+not be shown. Last-Modified only has whole seconds, so it is left out
+until the second of the last change has passed; until then a client
+relying on it alone would miss a second change made in the same second.
+"""
+import hashlib
+from functools import cache, wraps
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.apps import apps
+from django.contrib import messages
+from django.db.models import Subquery
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils import timezone
+from django.utils.http import http_date
+
+from . import counters, fragments
+from .models import AccessRequest, Client, Counter, Record, UserProfile
+
+TRACKED = (Client, Record, UserProfile, AccessRequest)
+
+
+@cache
+def _release():
+    root = Path(apps.get_app_config('website').path) / 'templates'
+    stamp = hashlib.md5(usedforsecurity=False)
+    for path in sorted(root.rglob('*.html')):
+        stat = path.stat()
+        stamp.update(f'{path.relative_to(root)}:{stat.st_size}:{stat.st_mtime_ns}\n'.encode())
+    return stamp.hexdigest()
+
+
+def latest_updated_at(model):
+    """Subquery for the newest ``updated_at`` in ``model``'s table (an index lookup)."""
+    return Subquery(model.objects.order_by('-updated_at').values('updated_at')[:1])
+
+
+def validators(request, user):
+    """Return ``(etag, last modified timestamp or None)`` for the viewer, or ``None``.
+
+    ``None`` means the page must be rendered in full: the viewer isn't
+    staff or has messages waiting.
+    """
+    if not user.is_staff or len(messages.get_messages(request)):
+        return None
+    names = (counters.USERS, counters.CLIENTS, counters.RECORDS, counters.PENDING_ACCESS)
+    query = (
+        Counter.objects.filter(name__in=names).order_by('name')
+        .annotate(**{model._meta.model_name: latest_updated_at(model) for model in TRACKED})
+        .values_list('name', 'value', 'updated_at', *(model._meta.model_name for model in TRACKED))
+    )
+    rows = list(query)
+    if len(rows) < len(names):
+        # Only until the counters are first seeded
+        counters.get_counts(*names)
+        rows = list(query.all())
+    # The page embeds a CSRF token either way; make sure the secret exists
+    # now so the first response's fingerprint matches the next request's
+    get_token(request)
+    # The table maxima are the same on every row
+    latest = [stamp for stamp in rows[0][3:] if stamp]
+    parts = [
+        _release(), str(user.pk), str(user.is_staff), str(user.is_superuser),
+        request.META['CSRF_COOKIE'],
+    ]
+    parts += [f'{name}={value}@{updated_at.isoformat()}' for name, value, updated_at, *_ in rows]
+    parts += [stamp.isoformat() for stamp in latest]
+    versions = fragments.get_versions([fragments.USERS, fragments.CLIENTS, fragments.RECORDS, fragments.ACCESS])
+    parts += [f'{name}:{version}' for name, version in sorted(versions.items())]
+    digest = hashlib.md5('\x1f'.join(parts).encode(), usedforsecurity=False).hexdigest()
+    # Weak: the CSRF token in the body is masked differently every render
+    last_modified = int(max(latest + [updated_at for _, _, updated_at, *_ in rows]).timestamp())
+    if last_modified >= int(timezone.now().timestamp()):
+        last_modified = None
+    return f'W/"{digest}"', last_modified
+
+
+def _respond(request, found):
+    if found is None or request.method not in ('GET', 'HEAD'):
+        return None
+    etag, last_modified = found
+    return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+
+def _finish(response, found):
+    if found is not None and response.status_code in (200, 304):
+        etag, last_modified = found
+        response.headers.setdefault('ETag', etag)
+        if last_modified is not None:
+            response.headers.setdefault('Last-Modified', http_date(last_modified))
+        # Browsers keep the page but revalidate it on every visit
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def conditional_page(view):
+    """Answer conditional requests for a staff page with 304 when nothing changed.
+
+    Place it under ``read_replica`` so the fingerprint is read from the same
+    database as the page.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            user = await request.auser()
+            found = await sync_to_async(validators)(request, user)
+            response = _respond(request, found)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            return _finish(response, found)
+        return wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        found = validators(request, request.user)
+        response = _respond(request, found)
+        if response is None:
+            response = view(request, *args, **kwargs)
+        return _finish(response, found)
+    return wrapper
@@ -0,0 +1,48 @@
+from django.contrib.auth.models import User
+from django.db.models import F
+from django.utils import timezone
+
+from .models import AccessRequest, Client, Counter, Record
+
+USERS = 'users'
+CLIENTS = 'clients'
+RECORDS = 'records'
+PENDING_ACCESS = 'pending_access'
+
+# How each counter is computed from scratch; used to seed missing rows and
+# by the `rebuild_counters` management command.
+SOURCES = {
+    USERS: lambda: User.objects.count(),
+    CLIENTS: lambda: Client.objects.count(),
+    RECORDS: lambda: Record.objects.count(),
+    PENDING_ACCESS: lambda: AccessRequest.objects.filter(status=AccessRequest.STATUS_PENDING).count(),
+}
+
+
+def adjust(name, delta):
+    """Atomically add ``delta`` to a counter.
+
+    A counter that has never been seeded is left alone; the next read
+    computes it from the table, which already includes this change.
+    """
+    if delta:
+        Counter.objects.filter(name=name).update(value=F('value') + delta, updated_at=timezone.now())
+
+
+def get_counts(*names):
+    """Return ``{name: value}`` with a single query, seeding any missing counter."""
+    values = dict(Counter.objects.filter(name__in=names).values_list('name', 'value'))
+    for name in names:
+        if name not in values:
+            values[name] = SOURCES[name]()
+            Counter.objects.update_or_create(name=name, defaults={'value': values[name]})
+    return values
+
+
+def rebuild(names=None):
+    """Recompute counters from the underlying tables and store them."""
+    values = {}
+    for name in names or SOURCES:
+        values[name] = SOURCES[name]()
+        Counter.objects.update_or_create(name=name, defaults={'value': values[name]})
+    return values
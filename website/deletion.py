@@ -0,0 +1,82 @@
+"""Deleting a user who owns many clients and records.
+
+``User.delete()`` would have the collector load every owned row, send a
+signal for each, and delete them all in one write transaction, which
+keeps SQLite locked for everyone until it finishes. ``delete_user()``
+empties the user's clients and records first instead. It works in
+batches of ``DELETE_BATCH_SIZE`` rows, each a set-based
+``DELETE ... WHERE id IN (...)`` in its own short transaction, and
+pauses for ``DELETE_BATCH_PAUSE`` seconds between batches so waiting
+writers get the lock. Only the user row and its few other dependents
+(profile, access requests) are left for the collector.
+
+Each batch commits on its own, so a run that stops part way can simply
+be run again.
+"""
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import counters, fragments
+from .bulk import delete_rows
+from .models import Client, Record
+
+# Rows owned through created_by, with the counter and fragment each touches
+OWNED = (
+    (Client, counters.CLIENTS, fragments.CLIENTS),
+    (Record, counters.RECORDS, fragments.RECORDS),
+)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def owned_counts(user):
+    """Return ``{'clients': rows, 'records': rows}`` for what ``user`` owns."""
+    return {counter: model.objects.filter(created_by=user).count() for model, counter, _ in OWNED}
+
+
+def _batch(model, counter, fragment, user, reassign_to, size):
+    with transaction.atomic():
+        pks = list(model.objects.filter(created_by=user).values_list('pk', flat=True)[:size])
+        if not pks:
+            return 0
+        if reassign_to is None:
+            # No signals: the counter and fragment are adjusted here instead
+            counters.adjust(counter, -delete_rows(model, pks))
+        else:
+            # update() skips auto_now
+            model.objects.filter(pk__in=pks).update(created_by=reassign_to, updated_at=timezone.now())
+        transaction.on_commit(lambda: fragments.bump(fragment))
+    return len(pks)
+
+
+def delete_user(user, reassign_to=None, progress=None):
+    """Delete ``user``, working through what they own in small batches.
+
+    With ``reassign_to``, their clients and records are handed to that
+    user instead of deleted. ``progress(done, total, message)`` is called
+    after every batch. Returns ``{'clients': rows, 'records': rows}``
+    removed or reassigned.
+    """
+    size = _setting('DELETE_BATCH_SIZE', 1000)
+    pause = _setting('DELETE_BATCH_PAUSE', 0.05)
+    verb = 'Deleted' if reassign_to is None else 'Reassigned'
+    total = sum(owned_counts(user).values())
+    done = 0
+    handled = {}
+    for model, counter, fragment in OWNED:
+        handled[counter] = 0
+        while count := _batch(model, counter, fragment, user, reassign_to, size):
+            handled[counter] += count
+            done += count
+            if progress is not None:
+                progress(done, max(total, done), f'{verb} {handled[counter]} {counter}')
+            # Let other writers in before taking the lock again
+            time.sleep(pause)
+    with transaction.atomic():
+        user.delete()
+    return handled
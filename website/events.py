@@ -0,0 +1,214 @@
+"""Live dashboard updates: an in-process pub/sub behind a Server-Sent Events stream.
+
+Every change to the dashboard's data already ends in ``fragments.bump()``
+once its transaction commits. That covers the model signals, bulk
+actions and batched deletes. ``bump()`` sends ``fragments.bumped``, and
+``publish()`` passes the changed tables to the broker. One pump task per
+process then reads the dashboard counters and table timestamps once (a
+single query) and fans the change out to every open stream. A stream is
+only an ``asyncio.Event`` on the server's event loop, so idle
+connections hold no thread and cost no queries. Bursts, such as a
+deletion's batches, are coalesced into one event.
+
+``publish()`` only reaches streams in its own process. While anyone is
+listening, the pump also re-reads the snapshot every
+``EVENTS_POLL_SECONDS``. That catches writes made by other ASGI workers
+and ``run_jobs``, at one query per process rather than one per viewer.
+
+What a stream may carry follows the viewer's role, which is read again
+through the user cache every ``EVENTS_HEARTBEAT_SECONDS``. A viewer who
+lost staff, or was deactivated or deleted, has their stream closed, and
+a demoted superuser stops getting access-request changes.
+"""
+import asyncio
+import json
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.dispatch import receiver
+
+from . import counters, fragments
+from .auth import CachedModelBackend
+from .concurrency import gather_sync
+from .conditional import latest_updated_at
+from .models import AccessRequest, Client, Counter, Record, UserProfile
+
+# Fragment dependency -> (counter, model whose newest updated_at is watched)
+WATCHED = {
+    fragments.USERS: (counters.USERS, UserProfile),
+    fragments.CLIENTS: (counters.CLIENTS, Client),
+    fragments.RECORDS: (counters.RECORDS, Record),
+    fragments.ACCESS: (counters.PENDING_ACCESS, AccessRequest),
+}
+# Shown on the dashboard to superusers only (see views._dashboard_context)
+SUPERUSER_ONLY = {fragments.ACCESS: counters.PENDING_ACCESS}
+# Wait this long after a change for more before telling the streams
+COALESCE_SECONDS = 0.2
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _snapshot():
+    """Return ``(stamp per table, counter values)`` with one query."""
+    names = [counter for counter, _ in WATCHED.values()]
+    query = (
+        Counter.objects.filter(name__in=names)
+        .annotate(**{table: latest_updated_at(model) for table, (_, model) in WATCHED.items()})
+        .values_list('name', 'value', 'updated_at', *WATCHED)
+    )
+    rows = list(query)
+    if len(rows) < len(names):
+        # Only until the counters are first seeded
+        counters.get_counts(*names)
+        rows = list(query.all())
+    counts = {name: value for name, value, *_ in rows}
+    changed_at = {name: updated_at for name, _, updated_at, *_ in rows}
+    # The table maxima are the same on every row
+    latest = dict(zip(WATCHED, rows[0][3:]))
+    stamps = {
+        table: (counts[counter], changed_at[counter], latest[table])
+        for table, (counter, _) in WATCHED.items()
+    }
+    return stamps, counts
+
+
+class _Subscriber:
+    def __init__(self, user):
+        self.ready = asyncio.Event()
+        self.tables = set()
+        self.counts = {}
+        self.allow(user)
+
+    def allow(self, user):
+        """Limit the stream to what ``user`` sees on the dashboard."""
+        hidden = {} if user.is_superuser else SUPERUSER_ONLY
+        self.hidden_tables = set(hidden)
+        self.hidden_counts = set(hidden.values())
+        # Drop anything already waiting that they may no longer see
+        self.tables -= self.hidden_tables
+        self.counts = {name: value for name, value in self.counts.items() if name not in self.hidden_counts}
+        if not self.tables:
+            self.ready.clear()
+
+    def push(self, tables, counts):
+        tables = tables - self.hidden_tables
+        if not tables:
+            return
+        self.tables |= tables
+        self.counts = {name: value for name, value in counts.items() if name not in self.hidden_counts}
+        self.ready.set()
+
+    def take(self):
+        """The pending change as an SSE message; several pushes merge into one."""
+        self.ready.clear()
+        data = {'tables': sorted(self.tables), 'counts': self.counts}
+        self.tables = set()
+        return f'event: change\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+
+
+class Broker:
+    def __init__(self):
+        self._subscribers = set()
+        self._pending = set()
+        self._loop = None
+        self._wake = None
+        self._pump_task = None
+
+    def publish(self, tables):
+        """Announce changed tables; safe to call from any thread."""
+        loop = self._loop
+        if loop is None or not self._subscribers:
+            return
+        try:
+            loop.call_soon_threadsafe(self._changed, set(tables))
+        except RuntimeError:  # the loop has closed
+            pass
+
+    def _changed(self, tables):
+        self._pending |= tables
+        self._wake.set()
+
+    def subscribe(self, user):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop, self._wake = loop, asyncio.Event()
+        subscriber = _Subscriber(user)
+        self._subscribers.add(subscriber)
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = loop.create_task(self._pump())
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self._subscribers.discard(subscriber)
+
+    async def _pump(self):
+        previous = None
+        while self._subscribers:
+            try:
+                await asyncio.wait_for(self._wake.wait(), _setting('EVENTS_POLL_SECONDS', 5))
+                await asyncio.sleep(COALESCE_SECONDS)
+            except TimeoutError:
+                pass
+            self._wake.clear()
+            tables, self._pending = self._pending, set()
+            try:
+                (stamps, counts), = await gather_sync(_snapshot)
+            except DatabaseError:
+                # Try again next round; the streams stay open
+                self._pending |= tables
+                continue
+            if previous is not None:
+                tables |= {table for table, stamp in stamps.items() if previous.get(table) != stamp}
+            previous = stamps
+            if tables:
+                for subscriber in list(self._subscribers):
+                    subscriber.push(tables, counts)
+
+
+BROKER = Broker()
+
+
+@receiver(fragments.bumped)
+def publish(sender, names, **kwargs):
+    BROKER.publish(names)
+
+
+async def _reload(user):
+    """``user`` as stored now, or ``None`` if they may no longer watch the dashboard."""
+    # Goes through the user cache, which every change to the user invalidates
+    user = await CachedModelBackend().aget_user(user.pk)
+    return user if user is not None and user.is_staff else None
+
+
+async def stream(user):
+    """Yield the SSE messages for ``user``'s dashboard connection until it closes.
+
+    Tables and counts ``user`` can't see on the dashboard are left out.
+    """
+    subscriber = BROKER.subscribe(user)
+    heartbeat = _setting('EVENTS_HEARTBEAT_SECONDS', 20)
+    loop = asyncio.get_running_loop()
+    checked = loop.time()
+    try:
+        # Reconnect quickly if the connection drops
+        yield 'retry: 3000\n\n'
+        while True:
+            try:
+                await asyncio.wait_for(subscriber.ready.wait(), heartbeat)
+            except TimeoutError:
+                pass
+            if loop.time() - checked >= heartbeat:
+                user = await _reload(user)
+                if user is None:
+                    return
+                subscriber.allow(user)
+                checked = loop.time()
+            if subscriber.ready.is_set():
+                yield subscriber.take()
+            else:
+                # Keeps proxies from closing an idle connection
+                yield ': ping\n\n'
+    finally:
+        BROKER.unsubscribe(subscriber)
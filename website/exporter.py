@@ -0,0 +1,98 @@
+import csv
+import json
+
+from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Client, Record
+
+# kind -> (model, exported columns, timestamp column used by since/until)
+EXPORTS = {
+    'users': (
+        User,
+        ['id', 'username', 'first_name', 'last_name', 'email', 'is_staff', 'is_superuser', 'date_joined'],
+        'date_joined',
+    ),
+    'clients': (
+        Client,
+        ['id', 'name', 'company', 'email', 'phone', 'notes', 'created_by_id', 'created_at'],
+        'created_at',
+    ),
+    'records': (
+        Record,
+        ['id', 'title', 'description', 'created_by_id', 'created_at'],
+        'created_at',
+    ),
+}
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+CHUNK_SIZE = 2000
+ROWS_PER_WRITE = 500
+
+
+def export_queryset(kind, since=None, until=None, created_by=None):
+    """Rows for ``kind`` as tuples of the exported columns.
+
+    Rows come in primary key order, or in ``(timestamp, pk)`` order when a
+    time window is given, so the window is read from the timestamp index
+    rather than by scanning the whole table.
+    """
+    model, columns, timestamp = EXPORTS[kind]
+    qs = model.objects.order_by(*([timestamp, 'pk'] if since or until else ['pk']))
+    if since:
+        qs = qs.filter(**{f'{timestamp}__gte': since})
+    if until:
+        qs = qs.filter(**{f'{timestamp}__lt': until})
+    if created_by and kind != 'users':
+        qs = qs.filter(created_by_id=created_by)
+    return qs.values_list(*columns)
+
+
+class _Echo:
+    # csv.writer needs a file; this one hands each line straight back
+    def write(self, value):
+        return value
+
+
+def _batched(lines):
+    # Join lines into larger writes; one socket write per row is wasteful
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= ROWS_PER_WRITE:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+def _counted(rows, progress):
+    count = 0
+    for count, row in enumerate(rows, start=1):
+        yield row
+        if count % CHUNK_SIZE == 0:
+            progress(count)
+    progress(count)
+
+
+def stream_rows(kind, fmt, rows, progress=None):
+    """Yield the export as text chunks, reading ``rows`` with a chunked cursor.
+
+    Only ``CHUNK_SIZE`` rows are held in memory at a time, so the export
+    runs in constant memory and the first bytes go out immediately.
+    ``progress`` is called with the number of rows read so far.
+    """
+    columns = EXPORTS[kind][1]
+    rows = rows.iterator(chunk_size=CHUNK_SIZE)
+    if progress:
+        rows = _counted(rows, progress)
+    if fmt == 'csv':
+        writer = csv.writer(_Echo())
+        lines = (writer.writerow(row) for row in rows)
+        yield writer.writerow(columns)
+    else:
+        encoder = DjangoJSONEncoder(separators=(',', ':'))
+        lines = (encoder.encode(dict(zip(columns, row))) + '\n' for row in rows)
+    yield from _batched(lines)
@@ -1,36 +1,26 @@
-from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
+from django.contrib.auth.forms import UserCreationForm, AuthenticationForm, SetPasswordMixin
 from django.contrib.auth.models import User
 
 from django import forms 
 from django.forms.widgets import PasswordInput, TextInput
-from .models import Client, Record
+from .models import AccessRequest, Client, Record
 
 class CreateUserForm(UserCreationForm):
+    # Widgets are built once with the class; each form instance gets a copy
+    password1, password2 = SetPasswordMixin.create_password_fields()
+    password1.widget.attrs.update({'class': 'form-control mb-3', 'placeholder': 'Password'})
+    password2.widget.attrs.update({'class': 'form-control', 'placeholder': 'Confirm Password'})
+
     class Meta:
         model = User
         fields = ("username", "first_name", "last_name", "email")
-
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
         # Add bootstrap classes and placeholders for a better UI
-        self.fields['username'].widget = TextInput(attrs={
-            'class': 'form-control mb-3', 'placeholder': 'Username'
-        })
-        self.fields['first_name'].widget = TextInput(attrs={
-            'class': 'form-control mb-3', 'placeholder': 'First Name'
-        })
-        self.fields['last_name'].widget = TextInput(attrs={
-            'class': 'form-control mb-3', 'placeholder': 'Last Name'
-        })
-        self.fields['email'].widget = forms.EmailInput(attrs={
-            'class': 'form-control mb-3', 'placeholder': 'Email Address'
-        })
-        self.fields['password1'].widget = PasswordInput(attrs={
-            'class': 'form-control mb-3', 'placeholder': 'Password'
-        })
-        self.fields['password2'].widget = PasswordInput(attrs={
-            'class': 'form-control', 'placeholder': 'Confirm Password'
-        })
+        widgets = {
+            'username': TextInput(attrs={'class': 'form-control mb-3', 'placeholder': 'Username'}),
+            'first_name': TextInput(attrs={'class': 'form-control mb-3', 'placeholder': 'First Name'}),
+            'last_name': TextInput(attrs={'class': 'form-control mb-3', 'placeholder': 'Last Name'}),
+            'email': forms.EmailInput(attrs={'class': 'form-control mb-3', 'placeholder': 'Email Address'}),
+        }
 
 class LoginForm(AuthenticationForm):
     username = forms.CharField(widget=TextInput(attrs={'class': 'form-control mb-3', 'placeholder': 'Username'}))
@@ -41,42 +31,39 @@ class ClientForm(forms.ModelForm):
     class Meta:
         model = Client
         fields = ("name", "company", "email", "phone", "notes")
-
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.fields['name'].widget = TextInput(attrs={'class': 'form-control mb-3', 'placeholder': 'Full name'})
-        self.fields['company'].widget = TextInput(attrs={'class': 'form-control mb-3', 'placeholder': 'Company (optional)'})
-        self.fields['email'].widget = forms.EmailInput(attrs={'class': 'form-control mb-3', 'placeholder': 'Email (optional)'})
-        self.fields['phone'].widget = TextInput(attrs={'class': 'form-control mb-3', 'placeholder': 'Phone (optional)'})
-        self.fields['notes'].widget = forms.Textarea(attrs={'class': 'form-control', 'rows': 4, 'placeholder': 'Notes (optional)'})
+        widgets = {
+            'name': TextInput(attrs={'class': 'form-control mb-3', 'placeholder': 'Full name'}),
+            'company': TextInput(attrs={'class': 'form-control mb-3', 'placeholder': 'Company (optional)'}),
+            'email': forms.EmailInput(attrs={'class': 'form-control mb-3', 'placeholder': 'Email (optional)'}),
+            'phone': TextInput(attrs={'class': 'form-control mb-3', 'placeholder': 'Phone (optional)'}),
+            'notes': forms.Textarea(attrs={'class': 'form-control', 'rows': 4, 'placeholder': 'Notes (optional)'}),
+        }
 
 
 class UserEditForm(forms.ModelForm):
     class Meta:
         model = User
         fields = ("username", "first_name", "last_name", "email", "is_staff")
-
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.fields['username'].widget = TextInput(attrs={'class': 'form-control mb-3', 'placeholder': 'Username'})
-        self.fields['first_name'].widget = TextInput(attrs={'class': 'form-control mb-3', 'placeholder': 'First name'})
-        self.fields['last_name'].widget = TextInput(attrs={'class': 'form-control mb-3', 'placeholder': 'Last name'})
-        self.fields['email'].widget = forms.EmailInput(attrs={'class': 'form-control mb-3', 'placeholder': 'Email'})
-        # Render is_staff as checkbox with spacing
-        self.fields['is_staff'].widget = forms.CheckboxInput(attrs={'class': 'form-check-input'})
+        widgets = {
+            'username': TextInput(attrs={'class': 'form-control mb-3', 'placeholder': 'Username'}),
+            'first_name': TextInput(attrs={'class': 'form-control mb-3', 'placeholder': 'First name'}),
+            'last_name': TextInput(attrs={'class': 'form-control mb-3', 'placeholder': 'Last name'}),
+            'email': forms.EmailInput(attrs={'class': 'form-control mb-3', 'placeholder': 'Email'}),
+            # Render is_staff as checkbox with spacing
+            'is_staff': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+        }
 
 
 class UserProfileForm(forms.ModelForm):
     class Meta:
         model = User
         fields = ("username", "first_name", "last_name", "email")
-
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.fields['username'].widget = TextInput(attrs={'class': 'form-control mb-3', 'placeholder': 'Username'})
-        self.fields['first_name'].widget = TextInput(attrs={'class': 'form-control mb-3', 'placeholder': 'First name'})
-        self.fields['last_name'].widget = TextInput(attrs={'class': 'form-control mb-3', 'placeholder': 'Last name'})
-        self.fields['email'].widget = forms.EmailInput(attrs={'class': 'form-control mb-3', 'placeholder': 'Email'})
+        widgets = {
+            'username': TextInput(attrs={'class': 'form-control mb-3', 'placeholder': 'Username'}),
+            'first_name': TextInput(attrs={'class': 'form-control mb-3', 'placeholder': 'First name'}),
+            'last_name': TextInput(attrs={'class': 'form-control mb-3', 'placeholder': 'Last name'}),
+            'email': forms.EmailInput(attrs={'class': 'form-control mb-3', 'placeholder': 'Email'}),
+        }
 
 
 class AdminCreateUserForm(CreateUserForm):
@@ -97,8 +84,95 @@ class RecordForm(forms.ModelForm):
     class Meta:
         model = Record
         fields = ("title", "description")
-
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.fields['title'].widget = TextInput(attrs={'class': 'form-control mb-3', 'placeholder': 'Title'})
-        self.fields['description'].widget = forms.Textarea(attrs={'class': 'form-control', 'rows': 4, 'placeholder': 'Description (optional)'})
+        widgets = {
+            'title': TextInput(attrs={'class': 'form-control mb-3', 'placeholder': 'Title'}),
+            'description': forms.Textarea(attrs={'class': 'form-control', 'rows': 4, 'placeholder': 'Description (optional)'}),
+        }
+
+
+class ImportForm(forms.Form):
+    KIND_CHOICES = [('clients', 'Clients'), ('records', 'Records')]
+    FORMAT_CHOICES = [('', 'Detect from file name'), ('csv', 'CSV'), ('ndjson', 'NDJSON (one JSON object per line)')]
+
+    kind = forms.ChoiceField(choices=KIND_CHOICES, widget=forms.Select(attrs={'class': 'form-select mb-3'}))
+    file = forms.FileField(widget=forms.ClearableFileInput(attrs={'class': 'form-control mb-3', 'accept': '.csv,.ndjson,.jsonl'}))
+    format = forms.ChoiceField(choices=FORMAT_CHOICES, required=False, widget=forms.Select(attrs={'class': 'form-select'}))
+
+    def clean(self):
+        cleaned = super().clean()
+        upload = cleaned.get('file')
+        if upload and not cleaned.get('format'):
+            from .importer import guess_format
+            fmt = guess_format(upload.name)
+            if not fmt:
+                raise forms.ValidationError('Could not tell the file format from its name; please choose one.')
+            cleaned['format'] = fmt
+        return cleaned
+
+
+class ExportFilterForm(forms.Form):
+    format = forms.ChoiceField(choices=[('csv', 'CSV'), ('ndjson', 'NDJSON')], required=False)
+    since = forms.DateTimeField(required=False)
+    until = forms.DateTimeField(required=False)
+    created_by = forms.IntegerField(required=False, min_value=1)
+    # Write the file in the background and offer it for download when done
+    background = forms.BooleanField(required=False)
+
+
+class ApiFilterForm(forms.Form):
+    """Query string filters for an API list; ``lookups`` maps each field to its ORM lookup.
+
+    Filters are limited to columns the model indexes cover (see the
+    models' ``Meta.indexes``).
+    """
+    lookups = {}
+
+    def filters(self):
+        return {
+            self.lookups[name]: value
+            for name, value in self.cleaned_data.items()
+            if value not in (None, '')
+        }
+
+
+class UserFilterForm(ApiFilterForm):
+    username = forms.CharField(required=False)
+    updated_since = forms.DateTimeField(required=False)
+
+    lookups = {'username': 'username', 'updated_since': 'profile__updated_at__gte'}
+
+
+class ClientFilterForm(ApiFilterForm):
+    created_by = forms.IntegerField(required=False, min_value=1)
+    name = forms.CharField(required=False)
+    company = forms.CharField(required=False)
+    email = forms.CharField(required=False)
+    since = forms.DateTimeField(required=False)
+    until = forms.DateTimeField(required=False)
+    updated_since = forms.DateTimeField(required=False)
+
+    lookups = {
+        'created_by': 'created_by_id', 'name': 'name', 'company': 'company', 'email': 'email',
+        'since': 'created_at__gte', 'until': 'created_at__lt', 'updated_since': 'updated_at__gte',
+    }
+
+
+class RecordFilterForm(ApiFilterForm):
+    created_by = forms.IntegerField(required=False, min_value=1)
+    title = forms.CharField(required=False)
+    since = forms.DateTimeField(required=False)
+    until = forms.DateTimeField(required=False)
+    updated_since = forms.DateTimeField(required=False)
+
+    lookups = {
+        'created_by': 'created_by_id', 'title': 'title',
+        'since': 'created_at__gte', 'until': 'created_at__lt', 'updated_since': 'updated_at__gte',
+    }
+
+
+class AccessRequestFilterForm(ApiFilterForm):
+    user = forms.IntegerField(required=False, min_value=1)
+    status = forms.ChoiceField(choices=[('', 'Any')] + AccessRequest.STATUS_CHOICES, required=False)
+    updated_since = forms.DateTimeField(required=False)
+
+    lookups = {'user': 'user_id', 'status': 'status', 'updated_since': 'updated_at__gte'}
@@ -0,0 +1,130 @@
+import hashlib
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.dispatch import Signal
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from . import routers
+from .concurrency import gather_sync
+
+USERS = 'users'
+CLIENTS = 'clients'
+RECORDS = 'records'
+ACCESS = 'access'
+
+# Rendered with this in place of the CSRF token so cached HTML never carries
+# another session's token; the real token is swapped in on every response.
+CSRF_PLACEHOLDER = '__csrf_token_placeholder__'
+
+# Sent with ``names`` after every bump; feeds the live dashboard (see events.py)
+bumped = Signal()
+
+
+def _version_key(name):
+    return f'dashboard:version:{name}'
+
+
+def get_versions(names):
+    """Return ``{name: version}`` for the given fragment dependencies.
+
+    A missing version (never set, or evicted) is initialised to the current
+    time so it can never collide with a version an old fragment was cached
+    under.
+    """
+    keys = {_version_key(name): name for name in names}
+    found = cache.get_many(keys)
+    versions = {}
+    for key, name in keys.items():
+        if key not in found:
+            cache.add(key, time.time_ns(), None)
+            found[key] = cache.get(key)
+        versions[name] = found[key]
+    return versions
+
+
+def bump(*names):
+    """Invalidate every fragment that depends on ``names``."""
+    for name in names:
+        key = _version_key(name)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+    bumped.send(sender=None, names=names)
+
+
+class Fragment:
+    """A template fragment cached under the versions of the data it shows.
+
+    ``build`` returns the template context and is only called on a miss, so
+    a warm fragment costs neither queries nor rendering. ``vary`` holds any
+    extra inputs the output depends on, such as the viewer's role or the
+    query string.
+    """
+
+    def __init__(self, name, template_name, depends_on, build, vary=()):
+        self.name = name
+        self.template_name = template_name
+        self.depends_on = depends_on
+        self.build = build
+        self.vary = vary
+
+    def key(self, versions):
+        parts = [self.template_name]
+        parts += [f'{dep}={versions[dep]}' for dep in self.depends_on]
+        parts += [str(v) for v in self.vary]
+        digest = hashlib.md5('\x1f'.join(parts).encode(), usedforsecurity=False).hexdigest()
+        return f'dashboard:fragment:{self.name}:{digest}'
+
+
+def _lookup(fragments):
+    versions = get_versions({dep for f in fragments for dep in f.depends_on})
+    keys = {f.name: f.key(versions) for f in fragments}
+    return keys, cache.get_many(keys.values())
+
+
+def _finish(request, fragments, keys, cached, contexts):
+    missing = {}
+    for f in fragments:
+        if f.name in contexts:
+            context = contexts[f.name]
+            context['csrf_token'] = CSRF_PLACEHOLDER
+            missing[keys[f.name]] = render_to_string(f.template_name, context, request)
+    if missing:
+        timeout = getattr(settings, 'DASHBOARD_FRAGMENT_TIMEOUT', 300)
+        if routers.read_alias():
+            # Built from a replica that may not have the write behind the
+            # latest version bump yet, so keep it no longer than the lag
+            timeout = min(timeout, routers.lag_seconds())
+        cache.set_many(missing, timeout)
+        cached.update(missing)
+    token = get_token(request)
+    return {
+        f.name: mark_safe(cached[keys[f.name]].replace(CSRF_PLACEHOLDER, token))
+        for f in fragments
+    }
+
+
+def render_fragments(request, fragments):
+    """Render ``fragments`` through the cache and return ``{name: html}``."""
+    keys, cached = _lookup(fragments)
+    contexts = {f.name: f.build() for f in fragments if keys[f.name] not in cached}
+    return _finish(request, fragments, keys, cached, contexts)
+
+
+async def arender_fragments(request, fragments):
+    """Async ``render_fragments``: cache misses are built concurrently.
+
+    ``build`` callables must evaluate their querysets, since the contexts
+    are rendered outside the threads that built them.
+    """
+    keys, cached = await sync_to_async(_lookup)(fragments)
+    missing = [f for f in fragments if keys[f.name] not in cached]
+    built = await gather_sync(*(f.build for f in missing))
+    contexts = {f.name: context for f, context in zip(missing, built)}
+    return await sync_to_async(_finish)(request, fragments, keys, cached, contexts)
@@ -0,0 +1,118 @@
+import codecs
+import csv
+import json
+
+from django.db import transaction
+
+from . import counters, fragments
+from .forms import ClientForm, RecordForm
+
+# What each import kind creates: (form used to validate a row, counter, fragment)
+KINDS = {
+    'clients': (ClientForm, counters.CLIENTS, fragments.CLIENTS),
+    'records': (RecordForm, counters.RECORDS, fragments.RECORDS),
+}
+FORMATS = ('csv', 'ndjson')
+MAX_REPORTED_ERRORS = 100
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+
+    def add_error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+
+def guess_format(filename):
+    """Return ``'csv'`` or ``'ndjson'`` from a file name, or ``None``."""
+    name = (filename or '').lower()
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    return None
+
+
+def iter_rows(lines, fmt):
+    """Yield ``(line number, row dict or error message)`` from byte lines.
+
+    ``lines`` is any iterable of byte strings (an open binary file or an
+    ``UploadedFile``), so the input is parsed as it streams in and never
+    held in memory as a whole.
+    """
+    text = codecs.iterdecode(lines, 'utf-8-sig')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield number, f'Invalid JSON: {exc}'
+            continue
+        if not isinstance(row, dict):
+            yield number, 'Expected a JSON object'
+            continue
+        yield number, row
+
+
+def _validate(form_class, data):
+    """Return ``(unsaved instance, None)`` or ``(None, error message)`` for one row."""
+    form = form_class(data=data)
+    if form.is_valid():
+        return form.instance, None
+    return None, '; '.join(f'{field}: {" ".join(errs)}' for field, errs in form.errors.items())
+
+
+def import_rows(kind, rows, owner, batch_size=1000, progress=None):
+    """Validate ``rows`` with the kind's form and insert them in batches.
+
+    Each batch is a single ``bulk_create`` in its own transaction, so a
+    failure only rolls back that batch and rows already committed stay.
+    Invalid rows are reported in the result and skipped. ``progress`` is
+    called with the result after every batch, inside the batch's
+    transaction, so anything it records commits together with the rows.
+    """
+    form_class, counter, fragment = KINDS[kind]
+    model = form_class._meta.model
+    result = ImportResult()
+    batch = []
+
+    def flush():
+        with transaction.atomic():
+            model.objects.bulk_create(batch, batch_size=batch_size)
+            # bulk_create skips post_save, so update what the signals would
+            counters.adjust(counter, len(batch))
+            transaction.on_commit(lambda: fragments.bump(fragment))
+            result.created += len(batch)
+            if progress:
+                progress(result)
+        batch.clear()
+
+    for line, row in rows:
+        result.rows += 1
+        if isinstance(row, str):
+            result.add_error(line, row)
+            continue
+        data = {name: '' if row.get(name) is None else str(row.get(name)) for name in form_class._meta.fields}
+        obj, message = _validate(form_class, data)
+        if obj is None:
+            result.add_error(line, message)
+            continue
+        obj.created_by = owner
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return result
@@ -0,0 +1,176 @@
+"""Background jobs: a queue in the ``Job`` table, run by ``manage.py run_jobs``.
+
+Views call ``enqueue()`` and return straight away. The worker claims due
+jobs with a conditional ``UPDATE``, so several worker processes can share
+the queue. It runs them on a thread pool and records their progress,
+result or error on the row. A job that raises is retried with
+exponential backoff until ``max_attempts``, then marked failed. A running
+job whose heartbeat (``updated_at``) is older than ``JOB_LEASE_SECONDS``
+belonged to a worker that died; that counts as a failed attempt too.
+
+Tasks are plain functions registered with ``@task('kind')`` (see
+``website.tasks``). They take the job and a ``Progress`` reporter. They
+must be safe to run again after a partial failure.
+"""
+import time
+import traceback
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+TASKS = {}
+
+
+def task(kind):
+    """Register ``func(job, progress)`` as the handler for ``kind`` jobs."""
+    def register(func):
+        TASKS[kind] = func
+        return func
+    return register
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def file_path(name):
+    """Where a job's input or output file ``name`` lives; creates its directory.
+
+    Uploads and exports are kept under ``JOB_FILES_DIR`` so the worker,
+    which may run on another thread or process, can reach them.
+    """
+    path = Path(_setting('JOB_FILES_DIR', settings.BASE_DIR / 'jobfiles')) / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def enqueue(kind, payload=None, user=None, max_attempts=None):
+    """Queue a job; it runs once the current transaction (if any) commits."""
+    return Job.objects.create(
+        kind=kind,
+        payload=payload or {},
+        created_by=user,
+        max_attempts=max_attempts or _setting('JOB_MAX_ATTEMPTS', 3),
+    )
+
+
+def retry(job):
+    """Queue a failed job again with a fresh set of attempts."""
+    return Job.objects.filter(pk=job.pk, status=Job.STATUS_FAILED).update(
+        status=Job.STATUS_QUEUED, attempts=0, run_after=timezone.now(), finished_at=None, updated_at=timezone.now(),
+    )
+
+
+class Progress:
+    """Records a running job's progress, writing at most every ``interval`` seconds.
+
+    A call that passes ``result`` is always written, so a task can store
+    what it needs to resume in the same transaction as the work it covers.
+    """
+
+    def __init__(self, job, interval=0.5):
+        self.job = job
+        self.interval = interval
+        self._written = 0.0
+
+    def __call__(self, done, total=None, message=None, result=None):
+        job = self.job
+        job.progress = done
+        if total is not None:
+            job.total = total
+        if message is not None:
+            job.message = message[:255]
+        if result is not None:
+            job.result = result
+        now = time.monotonic()
+        if result is not None or now - self._written >= self.interval or (job.total is not None and done >= job.total):
+            self._written = now
+            Job.objects.filter(pk=job.pk).update(
+                progress=job.progress, total=job.total, message=job.message, result=job.result,
+                updated_at=timezone.now(),
+            )
+
+
+def due(now):
+    """Queued jobs whose ``run_after`` has passed, oldest first."""
+    return Job.objects.filter(status=Job.STATUS_QUEUED, run_after__lte=now).order_by('run_after', 'id')
+
+
+def claim():
+    """Take the next due job, or return ``None`` if there is nothing to do."""
+    now = timezone.now()
+    for pk in due(now).values_list('pk', flat=True)[:5]:
+        # Another worker may get there first; only one UPDATE matches
+        claimed = Job.objects.filter(pk=pk, status=Job.STATUS_QUEUED).update(
+            status=Job.STATUS_RUNNING, attempts=F('attempts') + 1, started_at=now, updated_at=now,
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def _backoff(attempts):
+    """Seconds to wait before trying again after ``attempts`` failed attempts."""
+    return _setting('JOB_RETRY_DELAY', 10) * 2 ** (attempts - 1)
+
+
+def requeue_stale():
+    """Retry or fail the running jobs whose worker stopped sending heartbeats.
+
+    The lost run counts as an attempt, so a job that keeps killing or
+    hanging its worker fails after ``max_attempts`` like one that raises.
+    The rest are queued again with the usual backoff. Returns how many
+    were queued again.
+    """
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=_setting('JOB_LEASE_SECONDS', 600))
+    stale = Job.objects.filter(status=Job.STATUS_RUNNING, updated_at__lt=cutoff)
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.STATUS_FAILED, error='The worker stopped while running this job.',
+        message='Worker stopped; out of attempts', finished_at=now, updated_at=now,
+    )
+    requeued = 0
+    for pk, attempts in stale.values_list('pk', 'attempts'):
+        delay = _backoff(attempts)
+        # Filtered again in case another worker got to it first
+        requeued += stale.filter(pk=pk).update(
+            status=Job.STATUS_QUEUED, run_after=now + timedelta(seconds=delay),
+            message=f'Worker stopped during attempt {attempts}; retrying in {delay}s', updated_at=now,
+        )
+    return requeued
+
+
+def run(job):
+    """Run a claimed job and record how it went."""
+    func = TASKS.get(job.kind)
+    try:
+        if func is None:
+            raise LookupError(f'No task registered for {job.kind!r}')
+        result = func(job, Progress(job))
+    except Exception:
+        error = traceback.format_exc()
+        now = timezone.now()
+        if func is not None and job.attempts < job.max_attempts:
+            delay = _backoff(job.attempts)
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.STATUS_QUEUED, error=error, run_after=now + timedelta(seconds=delay),
+                message=f'Attempt {job.attempts} failed; retrying in {delay}s', result=job.result,
+                updated_at=now,
+            )
+        else:
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.STATUS_FAILED, error=error, finished_at=now, result=job.result, updated_at=now,
+            )
+        return False
+    now = timezone.now()
+    Job.objects.filter(pk=job.pk).update(
+        status=Job.STATUS_SUCCEEDED, result=result if result is not None else job.result,
+        progress=job.total if job.total is not None else job.progress,
+        error='', finished_at=now, updated_at=now,
+    )
+    return True
@@ -1,24 +1,87 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from website import fragments, jobs
 from website.models import UserProfile, AVATAR_CHOICES
 import random
 
 
+def _batches(queryset, batch_size):
+    # Walk primary keys in order, one LIMIT-ed query per batch, so memory
+    # stays at one batch however large the table is
+    last = 0
+    while True:
+        pks = list(queryset.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return
+        yield pks
+        last = pks[-1]
+
+
+def assign_avatars(batch_size, progress=None):
+    """Create missing profiles and fill blank avatars; return ``(created, updated)``.
+
+    ``progress`` is called with ``(done, total, message)`` after each batch.
+    """
+    # LEFT JOIN ... WHERE profile.id IS NULL
+    missing_profile = User.objects.filter(profile__isnull=True)
+    blank_avatar = UserProfile.objects.filter(avatar='')
+    missing_total = missing_profile.count()
+    blank_total = blank_avatar.count()
+    total = missing_total + blank_total
+
+    created = 0
+    for pks in _batches(missing_profile, batch_size):
+        with transaction.atomic():
+            UserProfile.objects.bulk_create(
+                [UserProfile(user_id=pk, avatar=random.choice(AVATAR_CHOICES)) for pk in pks],
+                ignore_conflicts=True,
+            )
+        created += len(pks)
+        if progress:
+            progress(created, total, f"Profiles: {created}/{missing_total}")
+
+    updated = 0
+    # bulk_update does not apply auto_now
+    now = timezone.now()
+    for pks in _batches(blank_avatar, batch_size):
+        with transaction.atomic():
+            UserProfile.objects.bulk_update(
+                [UserProfile(pk=pk, avatar=random.choice(AVATAR_CHOICES), updated_at=now) for pk in pks],
+                ['avatar', 'updated_at'],
+            )
+        updated += len(pks)
+        if progress:
+            progress(created + updated, total, f"Avatars: {updated}/{blank_total}")
+
+    if created or updated:
+        # bulk_create/bulk_update skip the signals that refresh the users table
+        fragments.bump(fragments.USERS)
+    return created, updated
+
+
 class Command(BaseCommand):
     help = "Assign random avatars to users missing a profile/avatar"
 
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help="Only report how many users would change")
+        parser.add_argument('--background', action='store_true', help="Queue the backfill for `run_jobs` instead")
+
     def handle(self, *args, **options):
-        created = 0
-        updated = 0
-        for u in User.objects.all():
-            profile, was_created = UserProfile.objects.get_or_create(user=u)
-            if was_created:
-                profile.avatar = random.choice(AVATAR_CHOICES)
-                profile.save(update_fields=["avatar"])
-                created += 1
-            elif not profile.avatar:
-                profile.avatar = random.choice(AVATAR_CHOICES)
-                profile.save(update_fields=["avatar"])
-                updated += 1
-        self.stdout.write(self.style.SUCCESS(f"Profiles created: {created}, avatars set: {created + updated}"))
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError("--batch-size must be at least 1")
+        if options['dry_run']:
+            missing_total = User.objects.filter(profile__isnull=True).count()
+            blank_total = UserProfile.objects.filter(avatar='').count()
+            self.stdout.write(f"Would create {missing_total} profiles and set {blank_total} blank avatars")
+            return
+        if options['background']:
+            job = jobs.enqueue('assign_avatars', {'batch_size': batch_size})
+            self.stdout.write(self.style.SUCCESS(f"Queued job {job.pk}"))
+            return
 
+        created, updated = assign_avatars(batch_size, lambda done, total, message: self.stdout.write(message))
+        self.stdout.write(self.style.SUCCESS(f"Profiles created: {created}, avatars set: {created + updated}"))
@@ -0,0 +1,233 @@
+import http.cookiejar
+import json
+import math
+import re
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client as TestClient, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from website import counters
+from website.models import Client, Record
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+BENCH_PREFIX = 'bench-'
+
+
+class _InProcess:
+    """Requests through Django's test client, in this process."""
+
+    def __init__(self):
+        self.client = TestClient()
+
+    def request(self, method, path, data=None):
+        if method == 'POST':
+            response = self.client.post(path, data or {})
+        else:
+            response = self.client.get(path)
+        return response.status_code, response.get('Server-Timing', '')
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class _Http:
+    """Requests to a running server, e.g. ``runserver`` or uvicorn."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect)
+
+    def _csrf_token(self):
+        for cookie in self.cookies:
+            if cookie.name == 'csrftoken':
+                return cookie.value
+        return ''
+
+    def request(self, method, path, data=None):
+        body = None
+        headers = {'Referer': self.base_url + '/'}
+        if method == 'POST':
+            if not self._csrf_token():
+                self.request('GET', reverse('login'))
+            token = self._csrf_token()
+            body = urllib.parse.urlencode({**(data or {}), 'csrfmiddlewaretoken': token}, doseq=True).encode()
+            headers['X-CSRFToken'] = token
+        req = urllib.request.Request(self.base_url + path, data=body, headers=headers, method=method)
+        try:
+            with self.opener.open(req) as response:
+                response.read()
+                return response.status, response.headers.get('Server-Timing', '')
+        except urllib.error.HTTPError as exc:
+            exc.read()
+            return exc.code, exc.headers.get('Server-Timing', '')
+
+
+def _percentile(sorted_values, pct):
+    # Nearest-rank percentile
+    index = max(0, math.ceil(len(sorted_values) * pct / 100) - 1)
+    return sorted_values[index]
+
+
+def _peak_rss_kb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+class Command(BaseCommand):
+    help = "Benchmark the main routes and report latency percentiles, queries per request and peak RSS"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', default='bench_admin', help="Superuser to log in as (see seed_data)")
+        parser.add_argument('--password', default='benchmark')
+        parser.add_argument('--requests', type=int, default=50, help="Measured requests per scenario")
+        parser.add_argument('--warmup', type=int, default=5, help="Unmeasured requests per scenario")
+        parser.add_argument('--url', help="Base URL of a running server; default: in-process test client. "
+                                              "The server's login throttle applies, so raise THROTTLE_IP_RATE there "
+                                              "or skip the login scenario")
+        parser.add_argument('--scenario', action='append', help="Only run these scenarios (repeatable)")
+        parser.add_argument('--output', help="JSON results file (default: benchmark-<timestamp>.json)")
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError("--requests must be at least 1")
+        scenarios = self.scenarios()
+        selected = options['scenario'] or list(scenarios)
+        unknown = set(selected) - set(scenarios)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}; choose from {', '.join(scenarios)}")
+        self.username = options['username']
+        self.password = options['password']
+        self.toggle_target = User.objects.filter(is_superuser=False).exclude(username=self.username).order_by('pk').first()
+        started_at = timezone.now()
+
+        if options['url']:
+            self.transport = _Http(options['url'])
+            results = self.run(scenarios, selected, options)
+        else:
+            self.transport = _InProcess()
+            # Every login comes from one client, which the login throttle
+            # would otherwise start rejecting after a few requests
+            unthrottled = (10 ** 6, 1)
+            with override_settings(ALLOWED_HOSTS=['testserver'], THROTTLE_IP_RATE=unthrottled, THROTTLE_USERNAME_RATE=unthrottled):
+                results = self.run(scenarios, selected, options)
+
+        report = {
+            'started_at': started_at.isoformat(),
+            'transport': options['url'] or 'in-process',
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'rows': counters.get_counts(counters.USERS, counters.CLIENTS, counters.RECORDS, counters.PENDING_ACCESS),
+            'warmup': options['warmup'],
+            'requests': options['requests'],
+            # Only meaningful in-process; with --url this is the runner itself
+            'peak_rss_kb': _peak_rss_kb(),
+            'scenarios': results,
+        }
+        path = options['output'] or f"benchmark-{started_at.strftime('%Y%m%d-%H%M%S')}.json"
+        with open(path, 'w') as fh:
+            json.dump(report, fh, indent=2)
+
+        self.stdout.write(f"{'scenario':<20}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}{'errors':>8}")
+        for name, r in results.items():
+            queries = '-' if r['queries_mean'] is None else f"{r['queries_mean']:.1f}"
+            self.stdout.write(f"{name:<20}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}{queries:>9}{r['errors']:>8}")
+        if report['peak_rss_kb'] is not None:
+            self.stdout.write(f"Peak RSS: {report['peak_rss_kb'] / 1024:.1f} MiB")
+        self.stdout.write(self.style.SUCCESS(f"Results written to {path}"))
+
+    def scenarios(self):
+        """Scenario name -> function returning ``(method, path, data)`` for the i-th call.
+
+        Each create scenario is paired with a delete scenario that removes
+        what it made, and the staff toggle flips back and forth, so a run
+        leaves the data as it found it.
+        """
+        def login(i):
+            return 'POST', reverse('login'), {'username': self.username, 'password': self.password}
+
+        def toggle_staff(i):
+            if self.toggle_target is None:
+                raise CommandError("Need at least one non-superuser to toggle; run seed_data first")
+            return 'POST', reverse('user_toggle_staff', args=[self.toggle_target.pk]), {'is_staff': '1' if i % 2 == 0 else '0'}
+
+        def client_delete(i):
+            pk = Client.objects.filter(name__startswith=BENCH_PREFIX).order_by('pk').values_list('pk', flat=True).first()
+            return 'POST', reverse('client_delete', args=[pk or 0]), {}
+
+        def record_delete(i):
+            pk = Record.objects.filter(title__startswith=BENCH_PREFIX).order_by('pk').values_list('pk', flat=True).first()
+            return 'POST', reverse('record_delete', args=[pk or 0]), {}
+
+        return {
+            'login': login,
+            'dashboard': lambda i: ('GET', reverse('dashboard'), None),
+            'dashboard_sorted': lambda i: ('GET', reverse('dashboard') + '?clients_sort=name&records_sort=title', None),
+            'search': lambda i: ('GET', reverse('search') + '?q=acme', None),
+            'client_new': lambda i: ('POST', reverse('client_new'), {'name': f'{BENCH_PREFIX}{i}', 'company': 'Bench'}),
+            'client_delete': client_delete,
+            'record_new': lambda i: ('POST', reverse('record_new'), {'title': f'{BENCH_PREFIX}{i}'}),
+            'record_delete': record_delete,
+            'user_toggle_staff': toggle_staff,
+        }
+
+    def run(self, scenarios, selected, options):
+        status, _ = self.transport.request(*scenarios['login'](0))
+        status, _ = self.transport.request('GET', reverse('dashboard'))
+        if status != 200:
+            raise CommandError(f"Could not log in as {self.username!r} (dashboard returned {status})")
+        was_staff = self.toggle_target.is_staff if self.toggle_target else None
+
+        results = {}
+        for name in selected:
+            build = scenarios[name]
+            latencies, queries, errors = [], [], 0
+            for i in range(options['warmup'] + options['requests']):
+                method, path, data = build(i)
+                started = time.perf_counter()
+                status, timing = self.transport.request(method, path, data)
+                elapsed = time.perf_counter() - started
+                if i < options['warmup']:
+                    continue
+                latencies.append(elapsed * 1000)
+                if status >= 400:
+                    errors += 1
+                match = SERVER_TIMING_QUERIES.search(timing)
+                if match:
+                    queries.append(int(match.group(1)))
+            latencies.sort()
+            results[name] = {
+                'requests': len(latencies),
+                'errors': errors,
+                'p50_ms': _percentile(latencies, 50),
+                'p95_ms': _percentile(latencies, 95),
+                'p99_ms': _percentile(latencies, 99),
+                'mean_ms': sum(latencies) / len(latencies),
+                'queries_mean': sum(queries) / len(queries) if queries else None,
+                'queries_max': max(queries) if queries else None,
+            }
+            self.stdout.write(f"{name}: done")
+
+        if self.toggle_target is not None:
+            self.toggle_target.is_staff = was_staff
+            self.toggle_target.save(update_fields=['is_staff'])
+        return results
@@ -0,0 +1,53 @@
+import os
+import xml.etree.ElementTree as ET
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand, CommandError
+from website.models import AVATAR_CHOICES
+from website.templatetags.avatar import SPRITE_PATH, sprite_id
+
+SVG_NS = 'http://www.w3.org/2000/svg'
+
+
+def _prefix_ids(element, prefix):
+    # Every avatar defines its own gradient ids; make them unique in the sprite
+    for node in element.iter():
+        if 'id' in node.attrib:
+            node.set('id', f"{prefix}-{node.get('id')}")
+        for name, value in node.attrib.items():
+            if 'url(#' in value:
+                node.set(name, value.replace('url(#', f'url(#{prefix}-'))
+            elif name.endswith('href') and value.startswith('#'):
+                node.set(name, f'#{prefix}-{value[1:]}')
+
+
+class Command(BaseCommand):
+    help = "Combine the AVATAR_CHOICES SVGs into one sprite addressed by fragment IDs"
+
+    def handle(self, *args, **options):
+        ET.register_namespace('', SVG_NS)
+        sprite = ET.Element(f'{{{SVG_NS}}}svg')
+        x = 0
+        height = 0
+        for avatar in AVATAR_CHOICES:
+            path = finders.find(avatar)
+            if not path:
+                raise CommandError(f"Static file {avatar!r} not found")
+            svg = ET.parse(path).getroot()
+            width, h = float(svg.get('width', 64)), float(svg.get('height', 64))
+            name = sprite_id(avatar)
+            _prefix_ids(svg, name)
+            # <img src="sprite.svg#avatar3"> shows just the matching view
+            ET.SubElement(sprite, f'{{{SVG_NS}}}view', id=name, viewBox=f'{x:g} 0 {width:g} {h:g}')
+            svg.set('x', f'{x:g}')
+            svg.set('y', '0')
+            sprite.append(svg)
+            x += width
+            height = max(height, h)
+        sprite.set('width', f'{x:g}')
+        sprite.set('height', f'{height:g}')
+        sprite.set('viewBox', f'0 0 {x:g} {height:g}')
+        target = os.path.join(settings.STATICFILES_DIRS[0], SPRITE_PATH)
+        ET.ElementTree(sprite).write(target, encoding='unicode', short_empty_elements=True)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(AVATAR_CHOICES)} avatars to {target}"))
@@ -0,0 +1,117 @@
+import re
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models
+from django.utils import timezone
+
+from website import api, counters, jobs, search
+from website.exporter import EXPORTS, export_queryset
+from website.models import AccessRequest, Client, Counter, Job, Record
+from website.pagination import KeysetPaginator
+from website.views import DASHBOARD_PAGINATORS
+
+# "SCAN table" with no index (SQLite prints "SCAN t USING INDEX i" otherwise)
+FULL_SCAN = re.compile(r'\bSCAN (\S+)$')
+TEMP_SORT = 'USE TEMP B-TREE'
+# Reading every row is the point of these, so their scans aren't flagged
+WHOLE_TABLE = '(whole table)'
+
+
+def _sample_position(paginator, sort):
+    field = paginator.queryset.model._meta.get_field(paginator.sort_fields[sort.lstrip('-')])
+    value = timezone.now() if isinstance(field, models.DateTimeField) else 'm'
+    return value, 1
+
+
+def _api_queries():
+    for resource in (api.USERS, api.CLIENTS, api.RECORDS, api.ACCESS_REQUESTS):
+        name = resource.model._meta.verbose_name_plural
+        paginator = KeysetPaginator(resource.model.objects.all(), '', resource.sort_fields, resource.default_sort)
+        for key, column in resource.sort_fields.items():
+            paginator.queryset = resource.queryset(list(resource.fields), column)
+            for sort in (key, f'-{key}'):
+                yield f'api {name} sort={sort}', paginator.page_queryset(sort)[:101]
+
+
+def hot_queries():
+    """Yield ``(label, queryset)`` for every query the views issue on a hot path."""
+    for table, make_paginator in DASHBOARD_PAGINATORS.items():
+        paginator = make_paginator()
+        for key in paginator.sort_fields:
+            for sort in (key, f'-{key}'):
+                yield f'dashboard {table} sort={sort}', paginator.page_queryset(sort)[:26]
+                yield (
+                    f'dashboard {table} sort={sort} (cursor)',
+                    paginator.page_queryset(sort, _sample_position(paginator, sort))[:26],
+                )
+    yield 'dashboard counters', Counter.objects.filter(name__in=list(counters.SOURCES))
+    yield 'dashboard recent users', User.objects.order_by('-date_joined')[:3]
+    yield 'dashboard pending access', AccessRequest.objects.filter(
+        status=AccessRequest.STATUS_PENDING).select_related('user')
+    yield 'dashboard own pending request', AccessRequest.objects.filter(
+        user_id=1, status=AccessRequest.STATUS_PENDING)[:1]
+    yield 'last superuser check', User.objects.filter(is_superuser=True).exclude(pk=1)[:1]
+    yield 'user by pk', User.objects.filter(pk=1)
+    yield 'client by pk', Client.objects.filter(pk=1)
+    yield 'record by pk', Record.objects.filter(pk=1)
+    yield 'access request by pk', AccessRequest.objects.filter(pk=1, status=AccessRequest.STATUS_PENDING)
+    yield 'session lookup', Session.objects.filter(session_key='x', expire_date__gt=timezone.now())
+    yield 'search clients', search.fts_query(Client, search.CLIENT_WEIGHTS, 'acme', 20)
+    yield 'search records', search.fts_query(Record, search.RECORD_WEIGHTS, 'invoice', 20)
+    yield from _api_queries()
+    since = timezone.now()
+    for kind in EXPORTS:
+        yield f'export {kind} {WHOLE_TABLE}', export_queryset(kind)
+        yield f'export {kind} since', export_queryset(kind, since=since)
+        if kind != 'users':
+            yield f'export {kind} by owner', export_queryset(kind, created_by=1)
+    yield 'job claim', jobs.due(timezone.now()).values_list('pk', flat=True)[:5]
+    # jobs.requeue_stale() runs this as an UPDATE, which has no ORDER BY
+    yield 'job stale check', Job.objects.filter(
+        status=Job.STATUS_RUNNING, updated_at__lt=timezone.now()).order_by()
+
+
+def _plan(query):
+    """EXPLAIN QUERY PLAN for a queryset or a raw query (search uses raw SQL)."""
+    if isinstance(query, models.QuerySet):
+        return query.explain()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {query.raw_query}', query.params)
+        return '\n'.join(' '.join(map(str, row)) for row in cursor.fetchall())
+
+
+class Command(BaseCommand):
+    help = (
+        "Run EXPLAIN QUERY PLAN on the hot queries (dashboard, search, API lists, exports, "
+        "job claims) and flag full table scans. Full exports read every row by design and "
+        "aren't flagged; search always sorts its matches by rank, so it shows as a temp sort."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help="Print the plan of every query, not just flagged ones")
+        parser.add_argument('--fail-on-scan', action='store_true', help="Exit with an error if any query does a full table scan")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("explain_queries reads SQLite's EXPLAIN QUERY PLAN output; the default database is %s" % connection.vendor)
+        scans = 0
+        for label, qs in hot_queries():
+            plan = _plan(qs)
+            lines = [line.split(' ', 3)[-1] for line in plan.splitlines()]
+            scanned = [m.group(1) for m in map(FULL_SCAN.search, lines) if m and not label.endswith(WHOLE_TABLE)]
+            sorts = any(TEMP_SORT in line for line in lines)
+            if scanned:
+                scans += 1
+                self.stdout.write(self.style.ERROR(f"FULL SCAN  {label}: {', '.join(scanned)}"))
+            elif sorts:
+                self.stdout.write(self.style.WARNING(f"TEMP SORT  {label}"))
+            else:
+                self.stdout.write(f"ok         {label}")
+            if options['verbose_plans'] or scanned or sorts:
+                for line in lines:
+                    self.stdout.write(f"             {line}")
+        if scans and options['fail_on_scan']:
+            raise CommandError(f"{scans} hot queries do a full table scan")
+        self.stdout.write(self.style.SUCCESS(f"Queries with full scans: {scans}"))
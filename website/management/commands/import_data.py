@@ -0,0 +1,37 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from website import importer
+
+
+class Command(BaseCommand):
+    help = "Stream-import clients or records from a CSV or NDJSON file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(importer.KINDS))
+        parser.add_argument('path')
+        parser.add_argument('--owner', required=True, help="Username recorded as created_by on every row")
+        parser.add_argument('--format', choices=importer.FORMATS, help="Input format (default: from the file extension)")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            owner = User.objects.get(username=options['owner'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['owner']!r}")
+        fmt = options['format'] or importer.guess_format(options['path'])
+        if not fmt:
+            raise CommandError("Could not tell the file format from its name; pass --format")
+
+        def progress(result):
+            self.stdout.write(f"{result.rows} rows read, {result.created} created, {result.failed} skipped")
+
+        with open(options['path'], 'rb') as fh:
+            result = importer.import_rows(
+                options['kind'], importer.iter_rows(fh, fmt), owner,
+                batch_size=options['batch_size'], progress=progress,
+            )
+        for line, message in result.errors:
+            self.stderr.write(f"line {line}: {message}")
+        if result.failed > len(result.errors):
+            self.stderr.write(f"... and {result.failed - len(result.errors)} more")
+        self.stdout.write(self.style.SUCCESS(f"Imported {result.created} of {result.rows} rows ({result.failed} skipped)"))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from website import counters
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized dashboard counters from the underlying tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', choices=sorted(counters.SOURCES), help="Counters to rebuild (default: all)")
+
+    def handle(self, *args, **options):
+        values = counters.rebuild(options['names'] or None)
+        for name, value in values.items():
+            self.stdout.write(f"{name}: {value}")
+        self.stdout.write(self.style.SUCCESS(f"Counters rebuilt: {len(values)}"))
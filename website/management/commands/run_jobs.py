@@ -0,0 +1,76 @@
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from website import caching, jobs
+
+
+def _run(job):
+    try:
+        return jobs.run(job)
+    finally:
+        # Pool threads outlive the job; don't leave their connections open
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (imports, exports, user deletion, avatar backfills)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=getattr(settings, 'JOB_WORKER_THREADS', 4),
+                            help="Jobs run at the same time in this process")
+        parser.add_argument('--poll', type=float, default=1.0, help="Seconds between checks for new jobs")
+        parser.add_argument('--once', action='store_true', help="Exit once no job is due instead of waiting for more")
+
+    def handle(self, *args, **options):
+        threads = options['threads']
+        if threads < 1:
+            raise CommandError("--threads must be at least 1")
+        if not caching.is_shared():
+            raise CommandError(
+                "The default cache is per process (locmem), so the web workers would never see "
+                "the dashboard and user invalidations made by jobs. Use CACHE_BACKEND=file or another shared cache."
+            )
+        stopping = []
+
+        def stop(signum, frame):
+            # Finish the running jobs, but claim no more
+            stopping.append(signum)
+            self.stdout.write("Stopping after the running jobs finish")
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        running = {}
+        with ThreadPoolExecutor(max_workers=threads, thread_name_prefix='job') as pool:
+            while not stopping:
+                requeued = jobs.requeue_stale()
+                if requeued:
+                    self.stdout.write(f"Queued {requeued} stalled job(s) again")
+                while len(running) < threads:
+                    job = jobs.claim()
+                    if job is None:
+                        break
+                    self.stdout.write(f"Job {job.pk} ({job.kind}) started, attempt {job.attempts}/{job.max_attempts}")
+                    running[pool.submit(_run, job)] = job
+                # The claims ran on this thread's connection; release it between polls
+                connections.close_all()
+                if not running:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll'])
+                    continue
+                done, _ = wait(running, timeout=options['poll'], return_when=FIRST_COMPLETED)
+                for future in done:
+                    self._report(running.pop(future), future)
+            for future in wait(running).done:
+                self._report(running.pop(future), future)
+
+    def _report(self, job, future):
+        # jobs.run() records failures itself and returns False
+        outcome = 'finished' if future.result() else 'failed (see the job for retries)'
+        self.stdout.write(f"Job {job.pk} ({job.kind}) {outcome}")
@@ -0,0 +1,183 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from website import counters, fragments
+from website.models import AVATAR_CHOICES, AccessRequest, Client, Record, UserProfile
+
+# Rows per main table (users, clients, records) for each --scale
+SCALES = {'1k': 1_000, '100k': 100_000, '1m': 1_000_000}
+
+FIRST_NAMES = ['Ada', 'Ben', 'Chloe', 'Dev', 'Elena', 'Farah', 'George', 'Hana', 'Ivan', 'Jade', 'Kofi', 'Lena', 'Mateo', 'Nia', 'Omar', 'Priya', 'Quinn', 'Rosa', 'Sam', 'Tariq']
+LAST_NAMES = ['Adams', 'Baker', 'Chen', 'Diaz', 'Evans', 'Fischer', 'Garcia', 'Hughes', 'Ito', 'Jones', 'Khan', 'Lopez', 'Martin', 'Novak', 'Okafor', 'Patel', 'Rossi', 'Smith', 'Tanaka', 'Walsh']
+COMPANIES = ['Acme', 'Globex', 'Initech', 'Umbrella', 'Hooli', 'Stark Industries', 'Wayne Enterprises', 'Soylent', 'Vandelay', 'Wonka']
+WORDS = ['quarterly', 'review', 'invoice', 'meeting', 'contract', 'renewal', 'audit', 'onboarding', 'proposal', 'budget', 'migration', 'support', 'follow-up', 'report', 'launch', 'roadmap']
+
+BENCH_USERNAME = 'bench_admin'
+HISTORY_DAYS = 3 * 365
+
+
+def _create_backdated(model, rows):
+    """``bulk_create`` rows, keeping the ``created_at`` each was built with.
+
+    auto_now_add overwrites it on insert, so it is written back afterwards
+    with ``bulk_update``, which leaves the field alone.
+    """
+    created_at = [row.created_at for row in rows]
+    rows = model.objects.bulk_create(rows)
+    for row, value in zip(rows, created_at):
+        row.created_at = value
+    model.objects.bulk_update(rows, ['created_at'])
+
+
+class Command(BaseCommand):
+    help = "Generate synthetic users, profiles, clients, records and access requests"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(SCALES), default='1k', help="Rows per main table")
+        parser.add_argument('--users', type=int, help="Override the number of users")
+        parser.add_argument('--clients', type=int, help="Override the number of clients")
+        parser.add_argument('--records', type=int, help="Override the number of records")
+        parser.add_argument('--password', default='benchmark', help="Password for every generated user")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed, so runs are repeatable")
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        size = SCALES[options['scale']]
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        n_users = options['users'] if options['users'] is not None else size
+        n_clients = options['clients'] if options['clients'] is not None else size
+        n_records = options['records'] if options['records'] is not None else size
+        if User.objects.filter(username__startswith='seed_').exists():
+            raise CommandError("Seed users already exist; seed into an empty database")
+        # Hashing is deliberately slow, so every user shares one hash
+        password = make_password(options['password'])
+
+        self._bench_user(options['password'])
+        user_ids = self._users(n_users, password)
+        # A few heavy owners and a long tail: weight each user by 1/rank
+        cum_weights, total = [], 0.0
+        for rank in range(len(user_ids)):
+            total += 1.0 / (rank + 1)
+            cum_weights.append(total)
+        owners = (user_ids, cum_weights)
+        self._clients(n_clients, owners)
+        self._records(n_records, owners)
+        self._access_requests(user_ids)
+
+        # Bulk inserts skip the signals that keep these up to date
+        counters.rebuild()
+        fragments.bump(fragments.USERS, fragments.CLIENTS, fragments.RECORDS, fragments.ACCESS)
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {n_users} users, {n_clients} clients and {n_records} records; "
+            f"log in as {BENCH_USERNAME!r} with the seed password"
+        ))
+
+    def _bench_user(self, password):
+        user, created = User.objects.get_or_create(
+            username=BENCH_USERNAME, defaults={'is_staff': True, 'is_superuser': True, 'email': 'bench@example.com'},
+        )
+        user.set_password(password)
+        user.save()
+
+    def _past(self):
+        # Skewed towards recent dates, like a growing product
+        return self.now - timedelta(days=self.rng.triangular(0, HISTORY_DAYS, 0))
+
+    def _insert(self, label, total, build):
+        done = 0
+        while done < total:
+            count = min(self.batch_size, total - done)
+            with transaction.atomic():
+                build(done, count)
+            done += count
+            self.stdout.write(f"{label}: {done}/{total}")
+
+    def _users(self, total, password):
+        user_ids = []
+        rng = self.rng
+
+        def build(offset, count):
+            users = []
+            for i in range(offset, offset + count):
+                first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                users.append(User(
+                    username=f'seed_{i:07d}', password=password, first_name=first, last_name=last,
+                    email=f'{first}.{last}.{i}@example.com'.lower(),
+                    is_staff=rng.random() < 0.02, date_joined=self._past(),
+                ))
+            created = User.objects.bulk_create(users)
+            user_ids.extend(u.pk for u in created)
+            UserProfile.objects.bulk_create([
+                UserProfile(user_id=u.pk, avatar='' if rng.random() < 0.02 else rng.choice(AVATAR_CHOICES))
+                for u in created
+            ])
+
+        self._insert('Users', total, build)
+        return user_ids
+
+    def _owner(self, owners):
+        user_ids, cum_weights = owners
+        return self.rng.choices(user_ids, cum_weights=cum_weights)[0]
+
+    def _clients(self, total, owners):
+        rng = self.rng
+
+        def build(offset, count):
+            clients = []
+            for _ in range(count):
+                first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                company = rng.choice(COMPANIES) if rng.random() < 0.7 else ''
+                clients.append(Client(
+                    name=f'{first} {last}', company=company,
+                    email=f'{first}.{last}@{(company or "mail").replace(" ", "")}.com'.lower() if rng.random() < 0.8 else '',
+                    phone=f'+44 7{rng.randrange(10**8, 10**9)}' if rng.random() < 0.5 else '',
+                    notes=' '.join(rng.choices(WORDS, k=rng.randint(5, 30))) if rng.random() < 0.3 else '',
+                    created_by_id=self._owner(owners), created_at=self._past(),
+                ))
+            _create_backdated(Client, clients)
+
+        self._insert('Clients', total, build)
+
+    def _records(self, total, owners):
+        rng = self.rng
+
+        def build(offset, count):
+            _create_backdated(Record, [
+                Record(
+                    title=' '.join(rng.choices(WORDS, k=rng.randint(2, 5))).capitalize(),
+                    description=' '.join(rng.choices(WORDS, k=rng.randint(10, 60))) if rng.random() < 0.6 else '',
+                    created_by_id=self._owner(owners), created_at=self._past(),
+                )
+                for _ in range(count)
+            ])
+
+        self._insert('Records', total, build)
+
+    def _access_requests(self, user_ids):
+        # About 1% of users have asked for access before; one in ten of
+        # those is still pending (at most one pending request per user)
+        rng = self.rng
+        requesters = rng.sample(user_ids, len(user_ids) // 100)
+        statuses = [AccessRequest.STATUS_APPROVED, AccessRequest.STATUS_DENIED]
+
+        def build(offset, count):
+            rows = []
+            for user_id in requesters[offset:offset + count]:
+                created_at = self._past()
+                if rng.random() < 0.1:
+                    rows.append(AccessRequest(user_id=user_id, created_at=created_at))
+                else:
+                    rows.append(AccessRequest(
+                        user_id=user_id, status=rng.choice(statuses), created_at=created_at,
+                        responded_at=min(self.now, created_at + timedelta(hours=rng.expovariate(1 / 24))),
+                    ))
+            _create_backdated(AccessRequest, rows)
+
+        self._insert('Access requests', len(requesters), build)
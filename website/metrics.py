@@ -0,0 +1,210 @@
+"""In-process request metrics, exported in the Prometheus text format.
+
+``MetricsMiddleware`` opens a ``RequestStats`` for every request and
+stores it in a context variable. Database time is collected by an
+execute wrapper installed on every connection as it opens, and template
+time by ``TimedDjangoTemplates``. Both read the context variable, so
+queries and renders on ``sync_to_async`` worker threads still count
+toward the request that started them. When a request finishes, its
+numbers go into per-view histograms in ``REGISTRY``.
+
+The registry lives in process memory, so each worker process reports
+only its own requests.
+"""
+import threading
+import time
+from contextvars import ContextVar
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends.django import DjangoTemplates, Template
+
+NAMESPACE = 'crudapp'
+
+# Upper bounds of the histogram buckets; +Inf is implied
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# name -> (help text, buckets)
+HISTOGRAMS = {
+    'request_duration_seconds': ('Wall time from the first middleware to the response', SECONDS_BUCKETS),
+    'db_query_duration_seconds': ('Total database time per request', SECONDS_BUCKETS),
+    'db_queries': ('Database queries per request', QUERY_BUCKETS),
+    'template_render_seconds': ('Total template rendering time per request', SECONDS_BUCKETS),
+    'response_size_bytes': ('Response body size (buffered responses only)', SIZE_BUCKETS),
+}
+
+# name -> help text; incremented with ``REGISTRY.inc(name, **labels)``
+COUNTERS = {
+    'throttle_rejections_total': 'Login/register attempts rejected before hashing a password, by scope',
+    'throttle_lockouts_total': 'Usernames locked out after repeated failed logins',
+    'login_failures_total': 'Failed login attempts',
+}
+
+_current = ContextVar('request_stats', default=None)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}  # (metric name, view) -> Histogram
+        self._responses = {}  # (view, status) -> count
+        self._counters = {}  # (counter name, sorted label pairs) -> count
+
+    def observe(self, view, status, values):
+        with self._lock:
+            key = (view, str(status))
+            self._responses[key] = self._responses.get(key, 0) + 1
+            for name, value in values.items():
+                hist = self._histograms.get((name, view))
+                if hist is None:
+                    hist = self._histograms[(name, view)] = Histogram(HISTOGRAMS[name][1])
+                hist.observe(value)
+
+    def inc(self, name, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._responses.clear()
+            self._counters.clear()
+
+    def render(self):
+        """The registry in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            name = f'{NAMESPACE}_responses_total'
+            lines += [f'# HELP {name} Responses by view and status code', f'# TYPE {name} counter']
+            for (view, status), count in sorted(self._responses.items()):
+                lines.append(f'{name}{{view="{_escape(view)}",status="{status}"}} {count}')
+            for counter, help_text in COUNTERS.items():
+                name = f'{NAMESPACE}_{counter}'
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+                for (counter_name, labels), count in sorted(self._counters.items()):
+                    if counter_name == counter:
+                        label = ','.join(f'{k}="{_escape(str(v))}"' for k, v in labels)
+                        lines.append(f'{name}{{{label}}} {count}' if label else f'{name} {count}')
+            for metric, (help_text, _) in HISTOGRAMS.items():
+                name = f'{NAMESPACE}_{metric}'
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+                for (hist_name, view), hist in sorted(self._histograms.items()):
+                    if hist_name != metric:
+                        continue
+                    label = f'view="{_escape(view)}"'
+                    cumulative = 0
+                    for bound, count in zip(hist.buckets + ('+Inf',), hist.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{label},le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_sum{{{label}}} {hist.sum:.6f}')
+                    lines.append(f'{name}_count{{{label}}} {hist.count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REGISTRY = Registry()
+
+
+class RequestStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self._render_depth = 0
+
+    def add_query(self, elapsed):
+        with self._lock:
+            self.queries += 1
+            self.db_time += elapsed
+
+    def enter_render(self):
+        with self._lock:
+            self._render_depth += 1
+            return self._render_depth == 1
+
+    def exit_render(self, outermost, elapsed):
+        with self._lock:
+            self._render_depth -= 1
+            # Templates rendered from inside another render are already
+            # covered by the outer one
+            if outermost:
+                self.template_time += elapsed
+
+
+def start_request():
+    stats = RequestStats()
+    return stats, _current.set(stats)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+def _record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add_query(time.perf_counter() - started)
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    # The permanent form of ``connection.execute_wrapper(_record_query)``:
+    # connections are per thread, so a per-request wrapper would miss
+    # queries made on worker threads
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        stats = _current.get()
+        if stats is None:
+            return super().render(context, request)
+        outermost = stats.enter_render()
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.exit_render(outermost, time.perf_counter() - started)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, with render time recorded per request."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
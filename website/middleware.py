@@ -0,0 +1,54 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.decorators import sync_and_async_middleware
+
+from . import metrics
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match and match.view_name else 'unresolved'
+
+
+def _finish(request, response, stats, token):
+    metrics.finish_request(token)
+    elapsed = time.perf_counter() - stats.started
+    values = {
+        'request_duration_seconds': elapsed,
+        'db_query_duration_seconds': stats.db_time,
+        'db_queries': stats.queries,
+        'template_render_seconds': stats.template_time,
+    }
+    if not response.streaming:
+        values['response_size_bytes'] = len(response.content)
+    metrics.REGISTRY.observe(_view_name(request), response.status_code, values)
+    response['Server-Timing'] = ', '.join([
+        f'app;dur={elapsed * 1000:.1f}',
+        f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries"',
+        f'tpl;dur={stats.template_time * 1000:.1f}',
+    ])
+    return response
+
+
+@sync_and_async_middleware
+def MetricsMiddleware(get_response):
+    """Record latency, queries, template time and size per URL name.
+
+    Place it first in ``MIDDLEWARE`` so the timings cover the whole stack.
+    Streaming responses are timed up to the point the view returns.
+    """
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            stats, token = metrics.start_request()
+            response = await get_response(request)
+            return _finish(request, response, stats, token)
+
+        markcoroutinefunction(middleware)
+    else:
+        def middleware(request):
+            stats, token = metrics.start_request()
+            response = get_response(request)
+            return _finish(request, response, stats, token)
+
+    return middleware
@@ -0,0 +1,92 @@
+# Generated by Django 5.2.3 on 2026-10-18 11:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def deny_duplicate_pending_requests(apps, schema_editor):
+    # Keep each user's newest pending request so the partial unique
+    # constraint below can be created.
+    AccessRequest = apps.get_model('website', 'AccessRequest')
+    Counter = apps.get_model('website', 'Counter')
+    seen = set()
+    duplicates = []
+    pending = AccessRequest.objects.filter(status='pending').order_by('user_id', '-created_at', '-id')
+    for pk, user_id in pending.values_list('pk', 'user_id'):
+        if user_id in seen:
+            duplicates.append(pk)
+        seen.add(user_id)
+    if duplicates:
+        AccessRequest.objects.filter(pk__in=duplicates).update(status='denied', note='Duplicate pending request')
+        # Re-seeded from the table on the next dashboard load
+        Counter.objects.filter(name='pending_access').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0005_counter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='accessrequest',
+            index=models.Index(fields=['user', 'status'], name='accessreq_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='accessrequest',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['created_at'], name='accessreq_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['created_at', 'id'], name='client_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['name', 'id'], name='client_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['company', 'id'], name='client_company_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['email', 'id'], name='client_email_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['created_by', 'created_at'], name='client_owner_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='record',
+            index=models.Index(fields=['created_at', 'id'], name='record_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='record',
+            index=models.Index(fields=['title', 'id'], name='record_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='record',
+            index=models.Index(fields=['created_by', 'created_at'], name='record_owner_created_idx'),
+        ),
+        # auth_user belongs to django.contrib.auth, so its indexes for the
+        # dashboard users table and the last-superuser check are raw SQL.
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS auth_user_joined_idx ON auth_user (date_joined, id)',
+            'DROP INDEX IF EXISTS auth_user_joined_idx',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS auth_user_email_idx ON auth_user (email, id)',
+            'DROP INDEX IF EXISTS auth_user_email_idx',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS auth_user_superuser_idx ON auth_user (id) WHERE is_superuser',
+            'DROP INDEX IF EXISTS auth_user_superuser_idx',
+        ),
+        migrations.RunPython(deny_duplicate_pending_requests, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='accessrequest',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'pending')), fields=('user',), name='one_pending_access_request_per_user'),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:11
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_updated_at(apps, schema_editor):
+    # Existing rows got the migration time; use the closest real timestamp
+    # instead so the first Last-Modified is meaningful
+    AccessRequest = apps.get_model('website', 'AccessRequest')
+    Client = apps.get_model('website', 'Client')
+    Record = apps.get_model('website', 'Record')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    UserProfile = apps.get_model('website', 'UserProfile')
+    Client.objects.update(updated_at=F('created_at'))
+    Record.objects.update(updated_at=F('created_at'))
+    AccessRequest.objects.update(updated_at=Coalesce('responded_at', 'created_at'))
+    joined = User.objects.filter(pk=OuterRef('user_id')).values('date_joined')[:1]
+    UserProfile.objects.update(updated_at=Subquery(joined))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0007_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='accessrequest',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='counter',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='record',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='accessrequest',
+            index=models.Index(fields=['updated_at'], name='accessreq_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['updated_at'], name='client_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='record',
+            index=models.Index(fields=['updated_at'], name='record_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['updated_at'], name='profile_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+from importlib import import_module
+
+from django.db import migrations
+
+# 0008 added updated_at to clients and records. On SQLite, AddField rebuilds
+# the table, and the rebuild dropped the FTS triggers 0007 created, so rows
+# written since then never reached the search index. Put the triggers back
+# and rebuild the index from the tables.
+search = import_module('website.migrations.0007_search')
+
+
+def restore_search_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table, columns in search.INDEXED.items():
+        fts = f'{table}_fts'
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {fts}_{suffix}')
+        for sql in search.triggers(table, columns):
+            schema_editor.execute(sql)
+        schema_editor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0009_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 
 
@@ -17,6 +18,13 @@ AVATAR_CHOICES = [
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     avatar = models.CharField(max_length=128, default='', blank=True)
+    # Also touched whenever the user row changes (see signals.touch_profile)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at'], name='profile_updated_idx'),
+        ]
 
     def __str__(self):
         return f"Profile({self.user.username})"
@@ -30,9 +38,20 @@ class Client(models.Model):
     notes = models.TextField(blank=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='clients')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Dashboard keyset pagination walks (<sort column>, id)
+            models.Index(fields=['created_at', 'id'], name='client_created_idx'),
+            models.Index(fields=['name', 'id'], name='client_name_idx'),
+            models.Index(fields=['company', 'id'], name='client_company_idx'),
+            models.Index(fields=['email', 'id'], name='client_email_idx'),
+            models.Index(fields=['created_by', 'created_at'], name='client_owner_created_idx'),
+            # Newest change, for the dashboard's conditional GET
+            models.Index(fields=['updated_at'], name='client_updated_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -53,9 +72,28 @@ class AccessRequest(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     responded_at = models.DateTimeField(null=True, blank=True)
     note = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # A user's own pending request, newest first, without a sort
+            models.Index(fields=['user', 'status', 'created_at'], name='accessreq_user_status_idx'),
+            models.Index(fields=['updated_at'], name='accessreq_updated_idx'),
+            # API list sorted by creation (keyset pagination walks (created_at, id))
+            models.Index(fields=['created_at', 'id'], name='accessreq_created_idx'),
+            # The superuser dashboard lists pending requests newest first
+            models.Index(
+                fields=['created_at'], name='accessreq_pending_idx',
+                condition=models.Q(status='pending'),
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user'], name='one_pending_access_request_per_user',
+                condition=models.Q(status='pending'),
+            ),
+        ]
 
     def __str__(self):
         return f"AccessRequest({self.user.username}, {self.status})"
@@ -68,9 +106,92 @@ class Record(models.Model):
     description = models.TextField(blank=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='records')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='record_created_idx'),
+            models.Index(fields=['title', 'id'], name='record_title_idx'),
+            models.Index(fields=['created_by', 'created_at'], name='record_owner_created_idx'),
+            models.Index(fields=['updated_at'], name='record_updated_idx'),
+        ]
 
     def __str__(self):
         return self.title
+
+
+class Counter(models.Model):
+    """Denormalized row count kept current by signals (see ``website.counters``)."""
+    name = models.CharField(max_length=64, primary_key=True)
+    value = models.BigIntegerField(default=0)
+    # Changes on every create and delete, which no row's updated_at shows
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}={self.value}"
+
+
+class Job(models.Model):
+    """A unit of background work, run by ``manage.py run_jobs`` (see ``website.jobs``)."""
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=64)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    progress = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True, blank=True)
+    message = models.CharField(max_length=255, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    # Not claimed before this; pushed back after each failed attempt
+    run_after = models.DateTimeField(default=timezone.now)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Doubles as the running job's heartbeat
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Workers poll for the next due job
+            models.Index(
+                fields=['run_after', 'id'], name='job_queued_idx',
+                condition=models.Q(status='queued'),
+            ),
+            models.Index(
+                fields=['updated_at'], name='job_running_idx',
+                condition=models.Q(status='running'),
+            ),
+            models.Index(fields=['created_by', 'created_at'], name='job_owner_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Job({self.pk}, {self.kind}, {self.status})"
+
+    @property
+    def label(self):
+        return self.kind.replace('_', ' ').capitalize()
+
+    @property
+    def is_active(self):
+        return self.status in (self.STATUS_QUEUED, self.STATUS_RUNNING)
+
+    @property
+    def percent(self):
+        if not self.total:
+            return 100 if self.status == self.STATUS_SUCCEEDED else 0
+        return min(100, self.progress * 100 // self.total)
@@ -0,0 +1,195 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+
+from django.conf import settings
+from django.db.models import Q
+
+
+def _encode_cursor(value, pk):
+    if isinstance(value, (datetime, date)):
+        value = value.isoformat()
+    raw = json.dumps([value, pk], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _decode_cursor(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        value, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return value, int(pk)
+    except (binascii.Error, ValueError, TypeError):
+        return None
+
+
+class SortLink:
+    def __init__(self, url, active, descending):
+        self.url = url
+        self.active = active
+        self.descending = descending
+
+
+class KeysetPage:
+    def __init__(self, object_list, sort, size, next_url, previous_url, sort_links, size_links):
+        self.object_list = object_list
+        self.sort = sort
+        self.size = size
+        self.next_url = next_url
+        self.previous_url = previous_url
+        self.sort_links = sort_links
+        self.size_links = size_links
+
+    @property
+    def has_next(self):
+        return self.next_url is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_url is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """Cursor (keyset) pagination over ``(sort column, id)``.
+
+    Each page is fetched with a ``WHERE (col, id) < (value, pk)`` style
+    filter plus ``LIMIT size + 1``, so the cost depends on the page size
+    and never on how far into the table the user has paged. All query
+    string parameters are namespaced with ``prefix`` so several tables can
+    be paginated independently on the same page. Sort columns must be
+    non-null.
+    """
+
+    page_sizes = (10, 25, 50, 100)
+
+    def __init__(self, queryset, prefix, sort_fields, default_sort, default_size=None, max_size=None):
+        self.queryset = queryset
+        self.prefix = prefix
+        self.sort_fields = sort_fields
+        self.default_sort = default_sort
+        self.default_size = default_size or getattr(settings, 'DASHBOARD_PAGE_SIZE', 25)
+        self.max_size = max_size or getattr(settings, 'DASHBOARD_MAX_PAGE_SIZE', 100)
+
+    def _param(self, name):
+        # An empty prefix (a page with a single table, such as the API)
+        # uses the bare names
+        return f'{self.prefix}_{name}' if self.prefix else name
+
+    def _url(self, params, **changes):
+        query = params.copy()
+        for name, value in changes.items():
+            key = self._param(name)
+            if value is None:
+                query.pop(key, None)
+            else:
+                query[key] = value
+        return '?' + query.urlencode()
+
+    def _resolve_sort(self, raw):
+        key = (raw or '').lstrip('-')
+        if key not in self.sort_fields:
+            return self.default_sort
+        return raw
+
+    def sort_field(self, params):
+        """The model field the request sorts on; querysets must load it."""
+        return self.sort_fields[self._resolve_sort(params.get(self._param('sort'))).lstrip('-')]
+
+    def _resolve_size(self, raw):
+        try:
+            size = int(raw)
+        except (TypeError, ValueError):
+            return self.default_size
+        return max(1, min(size, self.max_size))
+
+    def page_queryset(self, sort, position=None, backwards=False):
+        """Ordered, unsliced queryset for the page after (or before) ``position``.
+
+        ``position`` is a ``(sort value, pk)`` pair as stored in a cursor.
+        """
+        descending = sort.startswith('-')
+        field_name = self.sort_fields[sort.lstrip('-')]
+        # Walking backwards flips both the ordering and the comparison; the
+        # caller reverses the rows again so the page always reads top-down.
+        reverse = descending != backwards
+        prefix = '-' if reverse else ''
+        qs = self.queryset.order_by(f'{prefix}{field_name}', f'{prefix}pk')
+        if position is not None:
+            value, pk = position
+            op = 'lt' if reverse else 'gt'
+            qs = qs.filter(
+                Q(**{f'{field_name}__{op}': value})
+                | Q(**{field_name: value, f'pk__{op}': pk})
+            )
+        return qs
+
+    def paginate(self, params):
+        """Return a ``KeysetPage`` for the request's query parameters."""
+        sort = self._resolve_sort(params.get(self._param('sort')))
+        size = self._resolve_size(params.get(self._param('size')))
+        descending = sort.startswith('-')
+        field_name = self.sort_fields[sort.lstrip('-')]
+        field = self.queryset.model._meta.get_field(field_name)
+
+        after = params.get(self._param('after'))
+        before = params.get(self._param('before'))
+        cursor = _decode_cursor(after or before or '')
+        if cursor is not None:
+            value, pk = cursor
+            try:
+                value = field.to_python(value)
+            except Exception:
+                value = None
+            cursor = (value, pk) if value is not None else None
+        backwards = bool(before) and not after and cursor is not None
+        qs = self.page_queryset(sort, cursor, backwards)
+
+        rows = list(qs[:size + 1])
+        has_more = len(rows) > size
+        rows = rows[:size]
+        if backwards:
+            rows.reverse()
+
+        next_url = previous_url = None
+        if rows:
+            first, last = rows[0], rows[-1]
+            if has_more or backwards:
+                next_url = self._url(
+                    params, after=_encode_cursor(getattr(last, field_name), last.pk), before=None,
+                )
+            if (has_more and backwards) or (cursor is not None and not backwards):
+                previous_url = self._url(
+                    params, before=_encode_cursor(getattr(first, field_name), first.pk), after=None,
+                )
+
+        sort_links = {}
+        for key in self.sort_fields:
+            active = sort.lstrip('-') == key
+            # Clicking the active column flips its direction; any other
+            # column starts in the default direction for that column.
+            if active:
+                target = key if descending else f'-{key}'
+            elif key == self.default_sort.lstrip('-'):
+                target = self.default_sort
+            else:
+                target = key
+            sort_links[key] = SortLink(
+                self._url(params, sort=target, after=None, before=None),
+                active,
+                active and descending,
+            )
+        size_links = [
+            (s, self._url(params, size=s, after=None, before=None), s == size)
+            for s in self.page_sizes if s <= self.max_size
+        ]
+        return KeysetPage(rows, sort, size, next_url, previous_url, sort_links, size_links)
@@ -0,0 +1,114 @@
+"""Send selected reads to read-only replicas of the default database.
+
+Reads only leave the primary inside a view wrapped with ``read_replica``
+(the dashboard, search and exports); everything else, and every write,
+uses ``default``. After a session writes anything, ``ReplicaPinMiddleware``
+pins it to the primary for ``REPLICA_LAG_SECONDS`` so it never reads its
+own changes from a replica that hasn't caught up yet.
+"""
+import random
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+
+PIN_COOKIE = 'primary_pin'
+
+_read_alias = ContextVar('read_alias', default=None)
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def lag_seconds():
+    return getattr(settings, 'REPLICA_LAG_SECONDS', 5)
+
+
+def read_alias():
+    """The alias the current view reads from, or ``None`` for the primary."""
+    return _read_alias.get()
+
+
+def _choose(request):
+    aliases = replicas()
+    if not aliases:
+        return None
+    try:
+        pinned_until = float(request.COOKIES.get(PIN_COOKIE, 0))
+    except ValueError:
+        pinned_until = 0
+    if pinned_until > time.time():
+        return None
+    return random.choice(aliases)
+
+
+def read_replica(view):
+    """Serve the view's reads from a replica unless the session is pinned.
+
+    One replica is chosen per request so every query in it sees the same
+    snapshot. Work done after the view returns (a streaming body) must pass
+    ``read_alias()`` to ``.using()`` itself.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            token = _read_alias.set(_choose(request))
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                _read_alias.reset(token)
+        return wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        token = _read_alias.set(_choose(request))
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _read_alias.reset(token)
+    return wrapper
+
+
+@sync_and_async_middleware
+def ReplicaPinMiddleware(get_response):
+    """Pin a session to the primary for a while after any unsafe request."""
+
+    def pin(request, response):
+        if replicas() and request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE'):
+            seconds = lag_seconds()
+            response.set_cookie(PIN_COOKIE, str(time.time() + seconds), max_age=seconds, httponly=True, samesite='Lax')
+        return response
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            return pin(request, await get_response(request))
+
+        markcoroutinefunction(middleware)
+    else:
+        def middleware(request):
+            return pin(request, get_response(request))
+
+    return middleware
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == 'sessions':
+            # Logins must be visible on the very next request
+            return None
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are copies of the primary, never migrated directly
+        return db == 'default'
@@ -0,0 +1,68 @@
+import re
+from functools import reduce
+from operator import or_
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Client, Record
+
+MAX_TERMS = 8
+
+# Column weights for bm25(); earlier columns count for more
+CLIENT_WEIGHTS = (10.0, 5.0, 3.0, 3.0, 1.0)  # name, company, email, phone, notes
+RECORD_WEIGHTS = (5.0, 1.0)  # title, description
+
+
+def match_expression(query):
+    """Turn free text into an FTS5 MATCH expression.
+
+    Every word becomes a quoted prefix term (``"acm"*``) so user input can
+    never be parsed as FTS syntax, and all words must match.
+    """
+    terms = re.findall(r'\w+', query)[:MAX_TERMS]
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def fts_query(model, weights, query, limit):
+    """The ranked FTS5 lookup as an unevaluated ``RawQuerySet``."""
+    table = model._meta.db_table
+    fts = f'{table}_fts'
+    weight_args = ', '.join(str(w) for w in weights)
+    return model.objects.raw(
+        f'SELECT t.*, bm25({fts}, {weight_args}) AS rank '
+        f'FROM {fts} JOIN {table} t ON t.id = {fts}.rowid '
+        f'WHERE {fts} MATCH %s ORDER BY rank LIMIT %s',
+        [match_expression(query), limit],
+    )
+
+
+def _fts_search(model, weights, query, limit):
+    return list(fts_query(model, weights, query, limit))
+
+
+def _like_search(model, columns, query, limit):
+    # Fallback for databases without the FTS5 tables
+    terms = re.findall(r'\w+', query)[:MAX_TERMS]
+    qs = model.objects.all()
+    for term in terms:
+        qs = qs.filter(reduce(or_, (Q(**{f'{c}__icontains': term}) for c in columns)))
+    return list(qs[:limit])
+
+
+def search_clients(query, limit=20):
+    """Clients matching ``query``, best match first."""
+    if not match_expression(query):
+        return []
+    if connection.vendor == 'sqlite':
+        return _fts_search(Client, CLIENT_WEIGHTS, query, limit)
+    return _like_search(Client, ['name', 'company', 'email', 'phone', 'notes'], query, limit)
+
+
+def search_records(query, limit=20):
+    """Records matching ``query``, best match first."""
+    if not match_expression(query):
+        return []
+    if connection.vendor == 'sqlite':
+        return _fts_search(Record, RECORD_WEIGHTS, query, limit)
+    return _like_search(Record, ['title', 'description'], query, limit)
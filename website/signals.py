@@ -1,18 +1,22 @@
 import random
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import UserProfile, AVATAR_CHOICES
+from django.utils import timezone
+from . import counters, fragments
+from .auth import invalidate_users
+from .models import UserProfile, AVATAR_CHOICES, AccessRequest, Client, Record
 
 
 @receiver(post_save, sender=User)
-def ensure_profile_with_avatar(sender, instance: User, created, **kwargs):
+def ensure_profile_with_avatar(sender, instance: User, created, update_fields=None, **kwargs):
     # Create a profile on user creation and assign a random avatar
     if created:
         avatar = random.choice(AVATAR_CHOICES)
         UserProfile.objects.create(user=instance, avatar=avatar)
-    else:
-        # Ensure a profile exists for older users
+    elif update_fields is None or not set(update_fields) <= {'last_login'}:
+        # Any save but a login repairs older users' missing profile or avatar
         try:
             profile = instance.profile
             if not profile.avatar:
@@ -22,3 +26,94 @@ def ensure_profile_with_avatar(sender, instance: User, created, **kwargs):
             avatar = random.choice(AVATAR_CHOICES)
             UserProfile.objects.create(user=instance, avatar=avatar)
 
+
+@receiver(post_save, sender=User)
+def touch_profile(sender, instance, created, update_fields=None, **kwargs):
+    # User has no updated_at of its own, so its profile's stands in for it
+    # (the dashboard's Last-Modified). Logins only touch last_login.
+    if created or (update_fields is not None and set(update_fields) <= {'last_login'}):
+        return
+    UserProfile.objects.filter(user=instance).update(updated_at=timezone.now())
+
+
+# Denormalized counters for the dashboard stat cards
+_COUNTER_FOR = {
+    User: counters.USERS,
+    Client: counters.CLIENTS,
+    Record: counters.RECORDS,
+}
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Client)
+@receiver(post_save, sender=Record)
+def count_created(sender, instance, created, **kwargs):
+    if created:
+        counters.adjust(_COUNTER_FOR[sender], 1)
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Client)
+@receiver(post_delete, sender=Record)
+def count_deleted(sender, instance, **kwargs):
+    counters.adjust(_COUNTER_FOR[sender], -1)
+
+
+@receiver(post_init, sender=AccessRequest)
+def remember_access_status(sender, instance, **kwargs):
+    # Remember the status as loaded so post_save can tell whether a request
+    # entered or left the pending state without re-reading the row.
+    instance._loaded_status = instance.__dict__.get('status') if instance.pk else None
+
+
+@receiver(post_save, sender=AccessRequest)
+def count_pending_saved(sender, instance, created, **kwargs):
+    was_pending = not created and instance._loaded_status == AccessRequest.STATUS_PENDING
+    is_pending = instance.status == AccessRequest.STATUS_PENDING
+    counters.adjust(counters.PENDING_ACCESS, int(is_pending) - int(was_pending))
+    instance._loaded_status = instance.status
+
+
+@receiver(post_delete, sender=AccessRequest)
+def count_pending_deleted(sender, instance, **kwargs):
+    if instance._loaded_status == AccessRequest.STATUS_PENDING:
+        counters.adjust(counters.PENDING_ACCESS, -1)
+
+
+# Dashboard fragment cache invalidation. Versions are bumped once the
+# transaction commits so a concurrent request cannot re-cache stale rows
+# under the new version.
+_FRAGMENTS_FOR = {
+    User: (fragments.USERS, fragments.ACCESS),
+    UserProfile: (fragments.USERS,),
+    Client: (fragments.CLIENTS,),
+    Record: (fragments.RECORDS,),
+    AccessRequest: (fragments.ACCESS,),
+}
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=UserProfile)
+@receiver(post_save, sender=Client)
+@receiver(post_save, sender=Record)
+@receiver(post_save, sender=AccessRequest)
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=UserProfile)
+@receiver(post_delete, sender=Client)
+@receiver(post_delete, sender=Record)
+@receiver(post_delete, sender=AccessRequest)
+def invalidate_fragments(sender, instance, update_fields=None, **kwargs):
+    # Logins only touch last_login, which no dashboard table shows
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    names = _FRAGMENTS_FOR[sender]
+    transaction.on_commit(lambda: fragments.bump(*names))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    # Covers the role toggles, edit_user and delete_user. Dropped again on
+    # commit so a request racing the transaction can't re-cache the old row.
+    invalidate_users(instance.pk)
+    transaction.on_commit(lambda: invalidate_users(instance.pk))
@@ -0,0 +1,171 @@
+"""Production static files: fingerprinted, precompressed, served in-process.
+
+``CompressedManifestStaticFilesStorage`` gives every file a content-hashed
+name during ``collectstatic`` and writes ``.gz`` and ``.br`` siblings next
+to each compressible file. ``StaticFilesMiddleware`` serves STATIC_ROOT
+directly from the WSGI/ASGI app. It picks the best precompressed variant
+for the client, and marks hashed names as immutable, so browsers never
+revalidate them.
+"""
+import gzip
+import json
+import mimetypes
+import os
+from email.utils import formatdate
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils.decorators import sync_and_async_middleware
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:  # .br variants are skipped without a brotli module
+        brotli = None
+
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.map', '.xml', '.html')
+MIN_COMPRESS_SIZE = 256
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# Unhashed names can change on the next deploy
+REVALIDATE = 'public, max-age=60'
+
+
+def _compress(path):
+    with open(path, 'rb') as fh:
+        data = fh.read()
+    variants = [('.gz', lambda d: gzip.compress(d, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', lambda d: brotli.compress(d, quality=11)))
+    for suffix, compress in variants:
+        packed = compress(data)
+        # Not worth a variant unless it saves at least 5%
+        if len(packed) < len(data) * 0.95:
+            with open(path + suffix, 'wb') as fh:
+                fh.write(packed)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths) | set(self.hashed_files.values())
+        for name in names:
+            path = self.path(name)
+            if name.endswith(COMPRESSIBLE) and os.path.exists(path) and os.path.getsize(path) >= MIN_COMPRESS_SIZE:
+                _compress(path)
+
+
+class _StaticFile:
+    def __init__(self, path, immutable):
+        stat = os.stat(path)
+        self.path = path
+        self.content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.last_modified = formatdate(stat.st_mtime, usegmt=True)
+        self.cache_control = IMMUTABLE if immutable else REVALIDATE
+        self.tag = f'{stat.st_size:x}-{stat.st_mtime:.0f}'
+        # encoding -> (path, size); '' is the file itself
+        self.variants = {'': (path, stat.st_size)}
+        for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if os.path.exists(path + suffix):
+                self.variants[encoding] = (path + suffix, os.path.getsize(path + suffix))
+
+    def negotiate(self, request):
+        """Return ``(encoding, etag, not modified)`` for the request."""
+        accept = request.headers.get('Accept-Encoding', '')
+        encoding = next((e for e in ('br', 'gzip') if e in self.variants and e in accept), '')
+        etag = f'"{self.tag}-{encoding or "id"}"'
+        return encoding, etag, etag in request.headers.get('If-None-Match', '')
+
+
+def _index(root, prefix):
+    manifest = {}
+    manifest_path = os.path.join(root, 'staticfiles.json')
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as fh:
+            manifest = json.load(fh).get('paths', {})
+    hashed = set(manifest.values())
+    files = {}
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            if filename.endswith(('.gz', '.br')):
+                continue
+            path = os.path.join(directory, filename)
+            name = os.path.relpath(path, root).replace(os.sep, '/')
+            files[prefix + name] = _StaticFile(path, name in hashed)
+    return files
+
+
+def _read(path):
+    with open(path, 'rb') as fh:
+        return fh.read()
+
+
+def _respond(request, static_file, encoding, etag, not_modified, content=None):
+    path, size = static_file.variants[encoding]
+    if not_modified:
+        response = HttpResponseNotModified()
+    elif request.method == 'HEAD':
+        response = HttpResponse(content_type=static_file.content_type)
+    elif content is not None:
+        response = HttpResponse(content, content_type=static_file.content_type)
+    else:
+        # Lets the WSGI server use sendfile where it can
+        response = FileResponse(open(path, 'rb'), content_type=static_file.content_type)
+    if encoding:
+        response['Content-Encoding'] = encoding
+    if len(static_file.variants) > 1:
+        response['Vary'] = 'Accept-Encoding'
+    if response.status_code == 200:
+        response['Content-Length'] = str(size)
+    response['ETag'] = etag
+    response['Last-Modified'] = static_file.last_modified
+    response['Cache-Control'] = static_file.cache_control
+    return response
+
+
+@sync_and_async_middleware
+def StaticFilesMiddleware(get_response):
+    """Serve ``collectstatic`` output from STATIC_ROOT; enabled by ``SERVE_STATIC``.
+
+    The directory is indexed once at startup, so run ``collectstatic``
+    before starting the server.
+    """
+    if not getattr(settings, 'SERVE_STATIC', False) or not settings.STATIC_ROOT:
+        raise MiddlewareNotUsed
+    prefix = '/' + settings.STATIC_URL.lstrip('/')
+    files = _index(str(settings.STATIC_ROOT), prefix)
+
+    def lookup(request):
+        if request.method in ('GET', 'HEAD') and request.path_info.startswith(prefix):
+            return files.get(request.path_info)
+        return None
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            static_file = lookup(request)
+            if static_file is None:
+                return await get_response(request)
+            encoding, etag, not_modified = static_file.negotiate(request)
+            content = None
+            if request.method == 'GET' and not not_modified:
+                # ASGI would iterate a file response through a thread per
+                # chunk; static files are small, so read each in one go
+                path = static_file.variants[encoding][0]
+                content = await sync_to_async(_read, thread_sensitive=False)(path)
+            return _respond(request, static_file, encoding, etag, not_modified, content)
+
+        markcoroutinefunction(middleware)
+    else:
+        def middleware(request):
+            static_file = lookup(request)
+            if static_file is None:
+                return get_response(request)
+            return _respond(request, static_file, *static_file.negotiate(request))
+
+    return middleware
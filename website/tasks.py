@@ -0,0 +1,91 @@
+"""Handlers for background jobs (see ``website.jobs``).
+
+Each one must cope with being run again after a partial failure: imports
+resume after the last committed batch, and the rest either redo their
+work from scratch or find it already done.
+"""
+import itertools
+import os
+
+from django.contrib.auth.models import User
+from django.utils.dateparse import parse_datetime
+
+from . import deletion, exporter, importer
+from .jobs import file_path, task
+
+
+@task('delete_user')
+def delete_user(job, progress):
+    usr = User.objects.filter(pk=job.payload['user_id']).first()
+    if usr is None:
+        # Already gone, e.g. deleted by an earlier attempt that then failed
+        return {'username': job.payload.get('username'), 'deleted': False}
+    reassign_to = job.payload.get('reassign_to')
+    if reassign_to is not None:
+        reassign_to = User.objects.get(pk=reassign_to)
+    handled = deletion.delete_user(usr, reassign_to=reassign_to, progress=progress)
+    result = {'username': usr.username, 'deleted': True, **handled}
+    if reassign_to is not None:
+        result['reassigned_to'] = reassign_to.username
+    return result
+
+
+def _count_rows(path, fmt):
+    with open(path, 'rb') as fh:
+        lines = sum(1 for line in fh if line.strip())
+    # Approximate for CSV values with embedded newlines; only used for progress
+    return max(0, lines - 1) if fmt == 'csv' else lines
+
+
+@task('import')
+def import_file(job, progress):
+    payload = job.payload
+    path = file_path(payload['file'])
+    # Batches committed by earlier attempts are skipped, not imported twice
+    done = job.result or {'rows': 0, 'created': 0, 'failed': 0, 'errors': []}
+    total = _count_rows(path, payload['format'])
+    owner = User.objects.get(pk=payload['owner'])
+
+    def report(result):
+        progress(done['rows'] + result.rows, total, f'Imported {done["created"] + result.created} rows', {
+            'rows': done['rows'] + result.rows,
+            'created': done['created'] + result.created,
+            'failed': done['failed'] + result.failed,
+            'errors': (done['errors'] + result.errors)[:importer.MAX_REPORTED_ERRORS],
+        })
+
+    with open(path, 'rb') as fh:
+        rows = itertools.islice(importer.iter_rows(fh, payload['format']), done['rows'], None)
+        result = importer.import_rows(payload['kind'], rows, owner, progress=report)
+    report(result)
+    os.remove(path)
+    return job.result
+
+
+@task('export')
+def export_file(job, progress):
+    payload = job.payload
+    kind, fmt = payload['kind'], payload['format']
+    rows = exporter.export_queryset(
+        kind,
+        since=parse_datetime(payload['since']) if payload.get('since') else None,
+        until=parse_datetime(payload['until']) if payload.get('until') else None,
+        created_by=payload.get('created_by'),
+    )
+    total = rows.count()
+    name = f'exports/{job.pk}-{kind}.{fmt}'
+    path = file_path(name)
+    partial = path.with_name(path.name + '.part')
+    with open(partial, 'w', encoding='utf-8', newline='') as fh:
+        for chunk in exporter.stream_rows(kind, fmt, rows, lambda count: progress(count, total, f'Exported {count} rows')):
+            fh.write(chunk)
+    os.replace(partial, path)
+    return {'file': name, 'rows': total, 'filename': f'{kind}-{job.created_at:%Y%m%d-%H%M%S}.{fmt}'}
+
+
+@task('assign_avatars')
+def assign_avatars(job, progress):
+    from .management.commands.assign_avatars import assign_avatars as backfill
+
+    created, updated = backfill(job.payload.get('batch_size', 1000), progress)
+    return {'created': created, 'updated': updated}
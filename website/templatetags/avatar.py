@@ -1,15 +1,36 @@
+import os
+from functools import lru_cache
+
 from django import template
+from django.templatetags.static import static
 from django.utils.crypto import salted_hmac
 from website.models import AVATAR_CHOICES
 
 register = template.Library()
 
+# All AVATAR_CHOICES in one file, built by `manage.py build_avatar_sprite`
+SPRITE_PATH = 'img/avatars/sprite.svg'
+
+
+def sprite_id(avatar):
+    """Fragment ID of an avatar inside the sprite (``avatar3`` for ``.../avatar3.svg``)."""
+    return os.path.splitext(os.path.basename(avatar))[0]
+
+
+@lru_cache(maxsize=4096)
+def fallback_avatar(username):
+    """Deterministic avatar for a username, memoized per process."""
+    key = salted_hmac('avatar-pick', username or 'anon').hexdigest()
+    idx = int(key[:8], 16) % len(AVATAR_CHOICES)
+    return AVATAR_CHOICES[idx]
+
 
 @register.filter(name='avatar_path')
 def avatar_path(user):
     """Return a stable avatar path for a user.
     Prefers profile.avatar if present; otherwise choose deterministically
-    from AVATAR_CHOICES using a hash of the username.
+    from AVATAR_CHOICES using a hash of the username. Select the profile
+    with the user (``select_related('profile')``) to avoid a query per row.
     """
     try:
         avatar = getattr(user, 'profile', None) and getattr(user.profile, 'avatar', '')
@@ -18,7 +39,14 @@ def avatar_path(user):
     except Exception:
         pass
     # Deterministic pick based on username to avoid missing avatars
-    key = salted_hmac('avatar-pick', user.username or 'anon').hexdigest()
-    idx = int(key[:8], 16) % len(AVATAR_CHOICES)
-    return AVATAR_CHOICES[idx]
+    return fallback_avatar(user.username)
+
 
+@register.filter(name='avatar_src')
+def avatar_src(user):
+    """URL of the user's avatar, pointing into the shared sprite when it is one
+    of AVATAR_CHOICES, so a whole table of avatars costs a single request."""
+    avatar = avatar_path(user)
+    if avatar in AVATAR_CHOICES:
+        return f'{static(SPRITE_PATH)}#{sprite_id(avatar)}'
+    return static(avatar)
@@ -1,3 +1,533 @@
-from django.test import TestCase
+import asyncio
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import QueryDict
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import bulk, counters, deletion, events, fragments, jobs
+from .auth import CachedModelBackend
+from .events import _Subscriber
+from .exporter import export_queryset
+from .importer import import_rows
+from .models import AccessRequest, Client, Job, Record, UserProfile
+from .pagination import KeysetPaginator
+from .search import search_clients
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('staff', password='pw', is_staff=True)
+
+    def test_new_client_is_searchable(self):
+        # 0008's table rebuilds dropped the FTS triggers; 0010 restores them
+        client = Client.objects.create(name='Zebulon Quartz', company='Acme', created_by=self.staff)
+        self.assertEqual([c.pk for c in search_clients('zebulon')], [client.pk])
+
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('search'), {'q': 'quartz'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([c.pk for c in response.context['clients']], [client.pk])
+        self.assertContains(response, 'Zebulon Quartz')
+
+    def test_index_follows_inserts_updates_and_deletes(self):
+        client = Client.objects.create(name='Ottoline Birch', created_by=self.staff)
+        self.assertEqual(len(search_clients('ottoline')), 1)
+
+        client.name = 'Ottoline Hazel'
+        client.save()
+        self.assertEqual(search_clients('birch'), [])
+        self.assertEqual([c.pk for c in search_clients('hazel')], [client.pk])
+
+        # Touching an unindexed column leaves the entry alone
+        Client.objects.filter(pk=client.pk).update(created_by=self.staff)
+        self.assertEqual([c.pk for c in search_clients('hazel')], [client.pk])
+
+        client.delete()
+        self.assertEqual(search_clients('hazel'), [])
+        self.assertEqual(search_clients('ottoline'), [])
+
+
+class EventStreamTests(SimpleTestCase):
+    counts = {counters.CLIENTS: 3, counters.PENDING_ACCESS: 2}
+
+    def test_staff_stream_hides_access_requests(self):
+        subscriber = _Subscriber(User(is_staff=True))
+        subscriber.push({fragments.ACCESS}, self.counts)
+        self.assertFalse(subscriber.ready.is_set())
+
+        subscriber.push({fragments.ACCESS, fragments.CLIENTS}, self.counts)
+        message = subscriber.take()
+        self.assertIn('"tables":["clients"]', message)
+        self.assertNotIn(counters.PENDING_ACCESS, message)
+
+    def test_superuser_stream_sees_everything(self):
+        subscriber = _Subscriber(User(is_staff=True, is_superuser=True))
+        subscriber.push({fragments.ACCESS}, self.counts)
+        message = subscriber.take()
+        self.assertIn(f'"tables":["{fragments.ACCESS}"]', message)
+        self.assertIn(f'"{counters.PENDING_ACCESS}":2', message)
+
+    def test_demoted_superuser_loses_waiting_access_changes(self):
+        subscriber = _Subscriber(User(is_staff=True, is_superuser=True))
+        subscriber.push({fragments.ACCESS}, self.counts)
+        subscriber.allow(User(is_staff=True))
+        self.assertFalse(subscriber.ready.is_set())
+        subscriber.push({fragments.ACCESS}, self.counts)
+        self.assertFalse(subscriber.ready.is_set())
+
+    @override_settings(EVENTS_HEARTBEAT_SECONDS=0.01)
+    def test_stream_closes_once_the_viewer_loses_staff(self):
+        async def messages():
+            return [message async for message in events.stream(User(pk=1, is_staff=True))]
+
+        with mock.patch.object(events, '_reload', mock.AsyncMock(return_value=None)) as reload, \
+                mock.patch.object(events, '_snapshot', return_value=({}, {})):
+            self.assertEqual(asyncio.run(asyncio.wait_for(messages(), 5)), ['retry: 3000\n\n'])
+        reload.assert_awaited_once()
+
+
+class UserProfileTests(TestCase):
+    def test_role_toggle_repairs_a_missing_profile(self):
+        root = User.objects.create_superuser('root', 'root@example.com', 'pw')
+        usr = User.objects.create_user('old')
+        UserProfile.objects.filter(user=usr).delete()
+        self.client.force_login(root)
+        self.client.post(reverse('user_toggle_staff', args=[usr.pk]), {'is_staff': ['0', '1']})
+        self.assertTrue(User.objects.get(pk=usr.pk).is_staff)
+        self.assertNotEqual(UserProfile.objects.get(user=usr).avatar, '')
+
+    def test_login_does_not_touch_the_profile(self):
+        usr = User.objects.create_user('old')
+        UserProfile.objects.filter(user=usr).delete()
+        usr = User.objects.get(pk=usr.pk)
+        usr.last_login = timezone.now()
+        with self.assertNumQueries(1):
+            usr.save(update_fields=['last_login'])
+
+
+class ImportTests(TestCase):
+    def test_each_row_is_validated_on_its_own(self):
+        owner = User.objects.create_user('owner')
+        rows = [
+            (2, {'name': 'Ada', 'email': 'not-an-email'}),
+            (3, {'name': 'Grace', 'email': 'grace@example.com'}),
+            (4, {'company': 'No name'}),
+            (5, 'Invalid JSON: oops'),
+        ]
+        result = import_rows('clients', rows, owner)
+        self.assertEqual((result.rows, result.created, result.failed), (4, 1, 3))
+        self.assertEqual([line for line, _ in result.errors], [2, 4, 5])
+        self.assertIn('email', result.errors[0][1])
+        self.assertIn('name', result.errors[1][1])
+        # An earlier row's errors don't leak into the next one
+        self.assertNotIn('email', result.errors[1][1])
+        self.assertEqual(list(Client.objects.values_list('name', 'created_by')), [('Grace', owner.pk)])
+
+
+class BulkDeleteTests(TestCase):
+    def test_delete_clients_keeps_counter_and_index_in_step(self):
+        owner = User.objects.create_user('owner')
+        doomed = [Client.objects.create(name=f'Doomed {n}', created_by=owner).pk for n in range(3)]
+        kept = Client.objects.create(name='Kept', created_by=owner)
+        self.assertEqual(counters.get_counts(counters.CLIENTS)[counters.CLIENTS], 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(bulk.delete_clients(owner, doomed + [0]), 3)
+        self.assertEqual(list(Client.objects.values_list('pk', flat=True)), [kept.pk])
+        self.assertEqual(counters.get_counts(counters.CLIENTS)[counters.CLIENTS], 1)
+        self.assertEqual(search_clients('doomed'), [])
+
+
+@override_settings(DELETE_BATCH_SIZE=2, DELETE_BATCH_PAUSE=0)
+class DeleteUserTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('owner')
+        self.other = User.objects.create_user('other')
+        for n in range(5):
+            Client.objects.create(name=f'Client {n}', created_by=self.owner)
+        for n in range(3):
+            Record.objects.create(title=f'Record {n}', created_by=self.owner)
+        Client.objects.create(name='Not theirs', created_by=self.other)
+        counters.get_counts(counters.CLIENTS, counters.RECORDS)
+
+    def test_deletes_in_batches(self):
+        calls = []
+        handled = deletion.delete_user(self.owner, progress=lambda *args: calls.append(args))
+        self.assertEqual(handled, {counters.CLIENTS: 5, counters.RECORDS: 3})
+        # Batches of two: 2, 2, 1 clients, then 2, 1 records
+        self.assertEqual([done for done, _, _ in calls], [2, 4, 5, 7, 8])
+        self.assertEqual(calls[-1], (8, 8, 'Deleted 3 records'))
+        self.assertFalse(User.objects.filter(pk=self.owner.pk).exists())
+        self.assertEqual(list(Client.objects.values_list('name', flat=True)), ['Not theirs'])
+        self.assertFalse(Record.objects.exists())
+        self.assertEqual(counters.get_counts(counters.CLIENTS, counters.RECORDS),
+                         {counters.CLIENTS: 1, counters.RECORDS: 0})
+
+    def test_view_deactivates_and_queues_the_deletion(self):
+        staff = User.objects.create_user('staff', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.post(reverse('user_delete', args=[self.owner.pk]))
+        job = Job.objects.get(kind='delete_user')
+        self.assertRedirects(response, reverse('job_detail', args=[job.pk]), fetch_redirect_response=False)
+        self.assertFalse(User.objects.get(pk=self.owner.pk).is_active)
+        self.assertEqual(Client.objects.filter(created_by=self.owner).count(), 5)
+
+        self.assertTrue(jobs.run(jobs.claim()))
+        job.refresh_from_db()
+        self.assertEqual(job.result, {'username': 'owner', 'deleted': True, 'clients': 5, 'records': 3})
+        self.assertFalse(User.objects.filter(pk=self.owner.pk).exists())
+
+    def test_reassigns_instead(self):
+        handled = deletion.delete_user(self.owner, reassign_to=self.other)
+        self.assertEqual(handled, {counters.CLIENTS: 5, counters.RECORDS: 3})
+        self.assertEqual(Client.objects.filter(created_by=self.other).count(), 6)
+        self.assertEqual(Record.objects.filter(created_by=self.other).count(), 3)
+        self.assertEqual(counters.get_counts(counters.CLIENTS)[counters.CLIENTS], 6)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        owner = User.objects.create_user('owner')
+        # Repeated names, so pages have to break ties on the id
+        for name in ['Cy', 'Ann', 'Bo', 'Ann', 'Bo', 'Di', 'Ann']:
+            Client.objects.create(name=name, created_by=owner)
+        self.paginator = KeysetPaginator(Client.objects.all(), 'c', {'name': 'name'}, 'name', default_size=3)
+        self.expected = list(Client.objects.order_by('name', 'pk').values_list('pk', flat=True))
+
+    def _params(self, url):
+        return QueryDict(url.lstrip('?'), mutable=True)
+
+    def test_walks_forwards_and_back_without_gaps(self):
+        pages = [self.paginator.paginate(QueryDict(mutable=True))]
+        while pages[-1].next_url:
+            pages.append(self.paginator.paginate(self._params(pages[-1].next_url)))
+        self.assertEqual([[c.pk for c in page] for page in pages],
+                         [self.expected[0:3], self.expected[3:6], self.expected[6:]])
+        self.assertIsNone(pages[0].previous_url)
+
+        back = self.paginator.paginate(self._params(pages[-1].previous_url))
+        self.assertEqual([c.pk for c in back], self.expected[3:6])
+        back = self.paginator.paginate(self._params(back.previous_url))
+        self.assertEqual([c.pk for c in back], self.expected[0:3])
+
+    def test_descending_sort(self):
+        page = self.paginator.paginate(QueryDict('c_sort=-name&c_size=4'))
+        self.assertEqual([c.pk for c in page], self.expected[::-1][:4])
+        page = self.paginator.paginate(self._params(page.next_url))
+        self.assertEqual([c.pk for c in page], self.expected[::-1][4:])
+        self.assertIsNone(page.next_url)
+
+    def test_bad_cursor_and_sort_fall_back_to_the_first_page(self):
+        page = self.paginator.paginate(QueryDict('c_after=not-a-cursor&c_sort=password'))
+        self.assertEqual(page.sort, 'name')
+        self.assertEqual([c.pk for c in page], self.expected[:3])
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create_user('staff', is_staff=True)
+        self.client.force_login(self.staff)
+
+    def test_unchanged_dashboard_is_not_modified(self):
+        first = self.client.get(reverse('dashboard'))
+        self.assertEqual(first.status_code, 200)
+        etag = first['ETag']
+        again = self.client.get(reverse('dashboard'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(again.status_code, 304)
+
+        Client.objects.create(name='New', created_by=self.staff)
+        changed = self.client.get(reverse('dashboard'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+
+    def test_fragment_bump_changes_the_etag(self):
+        # E.g. a cache entry that outlived the data it was built from
+        etag = self.client.get(reverse('dashboard'))['ETag']
+        fragments.bump(fragments.CLIENTS)
+        self.assertEqual(self.client.get(reverse('dashboard'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_last_modified_waits_for_its_second_to_pass(self):
+        Client.objects.create(name='New', created_by=self.staff)
+        self.assertNotIn('Last-Modified', self.client.get(reverse('dashboard')))
+        later = timezone.now() + timedelta(seconds=2)
+        with mock.patch('website.conditional.timezone.now', return_value=later):
+            last_modified = self.client.get(reverse('dashboard'))['Last-Modified']
+            response = self.client.get(reverse('dashboard'), HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_other_viewer_gets_the_full_page(self):
+        etag = self.client.get(reverse('dashboard'))['ETag']
+        self.client.force_login(User.objects.create_user('other', is_staff=True))
+        self.assertEqual(self.client.get(reverse('dashboard'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.calls = []
+        patcher = mock.patch.dict(jobs.TASKS, {'flaky': self._flaky})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _flaky(self, job, progress):
+        self.calls.append(job.attempts)
+        if job.payload.get('fail'):
+            raise RuntimeError('boom')
+        progress(1, 1, 'Done')
+        return {'ok': True}
+
+    def test_claim_and_run(self):
+        job = jobs.enqueue('flaky')
+        claimed = jobs.claim()
+        self.assertEqual((claimed.pk, claimed.status, claimed.attempts), (job.pk, Job.STATUS_RUNNING, 1))
+        # Nothing else is due
+        self.assertIsNone(jobs.claim())
+        self.assertTrue(jobs.run(claimed))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result, job.progress), (Job.STATUS_SUCCEEDED, {'ok': True}, 1))
+
+    def test_failures_back_off_then_fail_and_can_be_retried(self):
+        job = jobs.enqueue('flaky', {'fail': True}, max_attempts=2)
+        self.assertFalse(jobs.run(jobs.claim()))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.STATUS_QUEUED, 1))
+        self.assertIn('boom', job.error)
+        # Backing off: not claimable until run_after passes
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIsNone(jobs.claim())
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        self.assertFalse(jobs.run(jobs.claim()))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.STATUS_FAILED, 2))
+        self.assertIsNone(jobs.claim())
+
+        self.assertEqual(jobs.retry(job), 1)
+        Job.objects.filter(pk=job.pk).update(payload={})
+        self.assertTrue(jobs.run(jobs.claim()))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_SUCCEEDED)
+        self.assertEqual(self.calls, [1, 2, 1])
+
+    def test_only_failed_jobs_are_retried(self):
+        job = jobs.enqueue('flaky')
+        self.assertEqual(jobs.retry(job), 0)
+
+    def _lose_worker(self, job):
+        Job.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+
+    def test_stale_running_jobs_are_queued_again(self):
+        job = jobs.enqueue('flaky')
+        jobs.claim()
+        self._lose_worker(job)
+        self.assertEqual(jobs.requeue_stale(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_QUEUED)
+        # Backs off like a failed run
+        self.assertGreater(job.run_after, timezone.now())
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        self.assertEqual(jobs.claim().attempts, 2)
+
+    def test_stale_job_out_of_attempts_fails(self):
+        job = jobs.enqueue('flaky', max_attempts=1)
+        jobs.claim()
+        self._lose_worker(job)
+        self.assertEqual(jobs.requeue_stale(), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_FAILED)
+        self.assertIsNotNone(job.finished_at)
+        self.assertIsNone(jobs.claim())
+
+
+class BulkActionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.root = User.objects.create_superuser('root', 'root@example.com', 'pw')
+        self.staff = User.objects.create_user('staff', is_staff=True)
+        self.users = [User.objects.create_user(f'user{n}') for n in range(3)]
+
+    def _post(self, action, ids):
+        response = self.client.post(reverse('bulk_action'), {'action': action, 'ids': [str(pk) for pk in ids]})
+        # Earlier messages are still queued, as the redirect isn't followed
+        return [str(m) for m in get_messages(response.wsgi_request)][-1:]
+
+    def test_grant_and_revoke_staff(self):
+        self.client.force_login(self.staff)
+        ids = [u.pk for u in self.users]
+        self.assertEqual(self._post('users_set_staff', ids), ['Granted staff status to 3 user(s).'])
+        self.assertEqual(User.objects.filter(pk__in=ids, is_staff=True).count(), 3)
+        self.assertEqual(self._post('users_revoke_staff', ids[:2]), ['Revoked staff status from 2 user(s).'])
+        self.assertEqual(User.objects.filter(pk__in=ids, is_staff=True).count(), 1)
+
+    def test_staff_cannot_touch_superusers(self):
+        self.client.force_login(self.staff)
+        self._post('users_revoke_staff', [self.root.pk])
+        self.root.refresh_from_db()
+        self.assertTrue(self.root.is_staff)
+        self.assertEqual(self._post('users_set_superuser', [self.users[0].pk]), ['Only superusers can do that.'])
+        self.assertFalse(User.objects.filter(pk=self.users[0].pk, is_superuser=True).exists())
+
+    def test_last_superuser_is_kept(self):
+        self.client.force_login(self.root)
+        self.assertEqual(self._post('users_revoke_superuser', [self.root.pk]),
+                         ['Cannot remove superuser status from the last superuser.'])
+        self.root.refresh_from_db()
+        self.assertTrue(self.root.is_superuser)
+
+        # With another superuser the same request goes through
+        self._post('users_set_superuser', [self.staff.pk])
+        self.assertEqual(self._post('users_revoke_superuser', [self.root.pk]),
+                         ['Revoked superuser status from 1 user(s).'])
+        self.assertFalse(User.objects.get(pk=self.root.pk).is_superuser)
+
+    def test_approve_access_requests(self):
+        requests = [AccessRequest.objects.create(user=u) for u in self.users[:2]]
+        self.client.force_login(self.root)
+        self._post('access_approve', [ar.pk for ar in requests])
+        self.assertEqual(User.objects.filter(pk__in=[u.pk for u in self.users[:2]], is_staff=True).count(), 2)
+        self.assertFalse(AccessRequest.objects.filter(status=AccessRequest.STATUS_PENDING).exists())
+        self.assertEqual(counters.get_counts(counters.PENDING_ACCESS)[counters.PENDING_ACCESS], 0)
+
+
+class ApiTests(TestCase):
+    def setUp(self):
+        self.root = User.objects.create_superuser('root', 'root@example.com', 'pw')
+        self.staff = User.objects.create_user('staff', is_staff=True)
+        for name in ['Cy', 'Ann', 'Bo']:
+            Client.objects.create(name=name, company='Acme', created_by=self.staff)
+        self.client.force_login(self.staff)
+
+    def test_requires_a_staff_session(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('api_client_list')).status_code, 401)
+        self.client.force_login(User.objects.create_user('nobody'))
+        self.assertEqual(self.client.get(reverse('api_client_list')).status_code, 403)
+
+    def test_fields_limits_the_columns(self):
+        data = self.client.get(reverse('api_client_list'), {'fields': 'name'}).json()
+        self.assertEqual({tuple(row) for row in data['results']}, {('id', 'name')})
+        response = self.client.get(reverse('api_client_list'), {'fields': 'name,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['error'])
+
+    def test_sorts_and_pages(self):
+        data = self.client.get(reverse('api_client_list'), {'sort': 'name', 'size': 2, 'fields': 'name'}).json()
+        self.assertEqual([row['name'] for row in data['results']], ['Ann', 'Bo'])
+        data = self.client.get(data['next']).json()
+        self.assertEqual([row['name'] for row in data['results']], ['Cy'])
+        self.assertIsNone(data['next'])
+
+    def test_etag_answers_304(self):
+        response = self.client.get(reverse('api_client_list'))
+        again = self.client.get(reverse('api_client_list'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+
+    def test_superuser_rules(self):
+        url = reverse('api_user_detail', args=[self.staff.pk])
+        response = self.client.patch(url, {'is_superuser': True}, content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+        response = self.client.patch(reverse('api_user_detail', args=[self.root.pk]), {'is_staff': False},
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+
+        self.client.force_login(self.root)
+        response = self.client.patch(reverse('api_user_detail', args=[self.root.pk]), {'is_superuser': False},
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.client.delete(reverse('api_user_detail', args=[self.root.pk])).status_code, 409)
+
+    def test_read_only_fields_are_refused(self):
+        client = Client.objects.get(name='Ann')
+        response = self.client.patch(reverse('api_client_detail', args=[client.pk]), {'created_by': self.root.pk},
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_delete_user_queues_a_job(self):
+        usr = User.objects.create_user('leaving')
+        response = self.client.delete(reverse('api_user_detail', args=[usr.pk]))
+        self.assertEqual(response.status_code, 202)
+        job = Job.objects.get(pk=response.json()['job'])
+        self.assertEqual(response['Location'], reverse('job_detail', args=[job.pk]))
+        self.assertFalse(User.objects.get(pk=usr.pk).is_active)
+        self.assertTrue(jobs.run(jobs.claim()))
+        self.assertFalse(User.objects.filter(pk=usr.pk).exists())
+
+
+class ImportExportTests(TestCase):
+    def setUp(self):
+        self.files = tempfile.TemporaryDirectory()
+        self.addCleanup(self.files.cleanup)
+        settings = override_settings(JOB_FILES_DIR=Path(self.files.name))
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.staff = User.objects.create_user('staff', is_staff=True)
+        self.client.force_login(self.staff)
+
+    def _round_trip(self, kind, fmt):
+        response = self.client.get(reverse('export_data', args=[kind]), {'format': fmt})
+        self.assertEqual(response.status_code, 200)
+        body = b''.join(response.streaming_content)
+        upload = SimpleUploadedFile(f'{kind}.{fmt}', body)
+        response = self.client.post(reverse('import_data'), {'kind': kind, 'file': upload})
+        job = Job.objects.get(kind='import')
+        self.assertRedirects(response, reverse('job_detail', args=[job.pk]), fetch_redirect_response=False)
+        self.assertTrue(jobs.run(jobs.claim()))
+        job.refresh_from_db()
+        return job.result
+
+    def test_clients_csv(self):
+        Client.objects.create(name='Ann, "the" first', email='ann@example.com', notes='two\nlines',
+                              created_by=self.staff)
+        Client.objects.create(name='Bo', company='Acme', created_by=self.staff)
+        result = self._round_trip('clients', 'csv')
+        self.assertEqual((result['rows'], result['created'], result['failed']), (2, 2, 0))
+        rows = Client.objects.order_by('pk').values_list('name', 'company', 'email', 'notes')
+        self.assertEqual(list(rows[2:]), list(rows[:2]))
+
+    def test_records_ndjson(self):
+        Record.objects.create(title='Invoice', description='Quarterly', created_by=self.staff)
+        result = self._round_trip('records', 'ndjson')
+        self.assertEqual((result['created'], result['failed']), (1, 0))
+        self.assertEqual(Record.objects.filter(title='Invoice', description='Quarterly').count(), 2)
+
+    def test_export_window(self):
+        old = Client.objects.create(name='Old', created_by=self.staff)
+        Client.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=30))
+        Client.objects.create(name='New', created_by=self.staff)
+        since = timezone.now() - timedelta(days=1)
+        self.assertEqual([row[1] for row in export_queryset('clients', since=since)], ['New'])
+        self.assertEqual([row[1] for row in export_queryset('clients', until=since)], ['Old'])
+
+
+class CachedUserTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('someone', password='old password')
+        self.backend = CachedModelBackend()
+
+    def test_cached_until_the_user_changes(self):
+        self.backend.get_user(self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.backend.get_user(self.user.pk).username, 'someone')
+        self.user.set_password('new password')
+        self.user.save()
+        with self.assertNumQueries(1):
+            cached = self.backend.get_user(self.user.pk)
+        self.assertEqual(cached.get_session_auth_hash(), self.user.get_session_auth_hash())
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_not_cached_per_process(self):
+        # Another process's invalidation would never reach this copy
+        self.backend.get_user(self.user.pk)
+        with self.assertNumQueries(1):
+            self.backend.get_user(self.user.pk)
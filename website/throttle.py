@@ -0,0 +1,97 @@
+"""Throttling for the password-hashing endpoints (login and register).
+
+Each client IP and each username gets a token bucket in the cache that
+refills continuously at ``rate`` attempts per ``period`` seconds, so the
+limit applies over a sliding window rather than fixed intervals. Failed
+logins are also counted per username; reaching
+``THROTTLE_LOCKOUT_FAILURES`` within ``THROTTLE_LOCKOUT_SECONDS`` locks the
+username for that long. Checks run before the form is validated, so a
+rejected request never reaches the password hasher.
+
+Buckets are read and written without a lock, so concurrent requests can
+occasionally get one or two extra attempts through; the limits are about
+CPU protection, not exact accounting.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import metrics
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def client_ip(request):
+    # Behind a reverse proxy REMOTE_ADDR is the proxy; have it set the real
+    # address (e.g. with a WSGI/ASGI proxy-headers middleware) first
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _take(key, rate, period):
+    """Take one token from a bucket; return 0, or the seconds until one is free."""
+    now = time.time()
+    tokens, stamp = cache.get(key) or (rate, now)
+    tokens = min(rate, tokens + (now - stamp) * rate / period)
+    if tokens < 1:
+        return (1 - tokens) * period / rate
+    cache.set(key, (tokens - 1, now), period)
+    return 0
+
+
+def _lockout_key(username):
+    return f'throttle:lockout:{username}'
+
+
+def _failures_key(username):
+    return f'throttle:failures:{username}'
+
+
+def _normalize(username):
+    return (username or '').strip().lower()[:150]
+
+
+def check(view, request, username=None):
+    """Return 0 if the attempt may go ahead, else seconds to wait.
+
+    ``username`` is checked too when given (logins); rejections are counted
+    in the metrics by scope.
+    """
+    ip_rate, ip_period = _setting('THROTTLE_IP_RATE', (20, 60))
+    wait = _take(f'throttle:{view}:ip:{client_ip(request)}', ip_rate, ip_period)
+    scope = 'ip'
+    if not wait and username is not None:
+        username = _normalize(username)
+        locked_until = cache.get(_lockout_key(username))
+        if locked_until:
+            wait, scope = max(1, locked_until - time.time()), 'lockout'
+        else:
+            user_rate, user_period = _setting('THROTTLE_USERNAME_RATE', (5, 60))
+            wait, scope = _take(f'throttle:{view}:user:{username}', user_rate, user_period), 'username'
+    if wait:
+        metrics.REGISTRY.inc('throttle_rejections_total', view=view, scope=scope)
+    return wait
+
+
+def login_failed(username):
+    """Count a failed login, locking the username out once it has too many."""
+    username = _normalize(username)
+    metrics.REGISTRY.inc('login_failures_total')
+    seconds = _setting('THROTTLE_LOCKOUT_SECONDS', 900)
+    key = _failures_key(username)
+    cache.add(key, 0, seconds)
+    try:
+        failures = cache.incr(key)
+    except ValueError:  # expired between add and incr
+        cache.set(key, 1, seconds)
+        failures = 1
+    if failures >= _setting('THROTTLE_LOCKOUT_FAILURES', 10):
+        cache.set(_lockout_key(username), time.time() + seconds, seconds)
+        cache.delete(key)
+        metrics.REGISTRY.inc('throttle_lockouts_total')
+
+
+def login_succeeded(username):
+    cache.delete(_failures_key(_normalize(username)))
@@ -1,12 +1,25 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, async_views, views
+
+# Under an ASGI server the dashboard and access-request routes can use async
+# views that don't tie up a worker thread while waiting on the database.
+dashboard_views = async_views if getattr(settings, 'ASYNC_VIEWS', False) else views
 
 urlpatterns = [
     path('', views.home, name="home"),
-    path('dashboard', views.dashboard, name="dashboard"),
-    path('dashboard/request-access', views.request_dashboard_access, name="dashboard_request_access"),
-    path('dashboard/access-requests/<int:pk>/approve', views.approve_access_request, name="dashboard_access_approve"),
-    path('dashboard/access-requests/<int:pk>/deny', views.deny_access_request, name="dashboard_access_deny"),
+    path('dashboard', dashboard_views.dashboard, name="dashboard"),
+    path('dashboard/request-access', dashboard_views.request_dashboard_access, name="dashboard_request_access"),
+    path('dashboard/access-requests/<int:pk>/approve', dashboard_views.approve_access_request, name="dashboard_access_approve"),
+    path('dashboard/access-requests/<int:pk>/deny', dashboard_views.deny_access_request, name="dashboard_access_deny"),
+    path('dashboard/bulk', views.bulk_action, name="bulk_action"),
+    path('search', views.search, name="search"),
+    path('import', views.import_data, name="import_data"),
+    path('export/<str:kind>', views.export_data, name="export_data"),
+    path('metrics', views.prometheus_metrics, name="metrics"),
+    path('jobs/<int:pk>', views.job_detail, name="job_detail"),
+    path('jobs/<int:pk>/retry', views.job_retry, name="job_retry"),
+    path('jobs/<int:pk>/download', views.job_download, name="job_download"),
     path('users/new', views.new_user, name="user_new"),
     path('users/<int:pk>/toggle-staff', views.toggle_user_staff, name="user_toggle_staff"),
     path('users/<int:pk>/edit', views.edit_user, name="user_edit"),
@@ -22,5 +35,23 @@ urlpatterns = [
     path('login', views.login, name="login"),
     path('register', views.register, name="register"),
     path('logout', views.logout_user, name="logout"),
+    path('api/users', api.user_list, name="api_user_list"),
+    path('api/users/<int:pk>', api.user_detail, name="api_user_detail"),
+    path('api/clients', api.client_list, name="api_client_list"),
+    path('api/clients/<int:pk>', api.client_detail, name="api_client_detail"),
+    path('api/records', api.record_list, name="api_record_list"),
+    path('api/records/<int:pk>', api.record_detail, name="api_record_detail"),
+    path('api/access-requests', api.access_request_list, name="api_access_request_list"),
+    path('api/access-requests/<int:pk>', api.access_request_detail, name="api_access_request_detail"),
+    path('api/access-requests/<int:pk>/approve', api.access_request_approve, name="api_access_request_approve"),
+    path('api/access-requests/<int:pk>/deny', api.access_request_deny, name="api_access_request_deny"),
     #path('store', views.store, name="store"),
 ]
+
+if getattr(settings, 'ASYNC_VIEWS', False):
+    # Live dashboard updates hold a connection open per viewer, which only
+    # an ASGI server can do without a thread each
+    urlpatterns += [
+        path('dashboard/events', async_views.dashboard_events, name="dashboard_events"),
+        path('dashboard/tables', async_views.dashboard_tables, name="dashboard_tables"),
+    ]
@@ -1,17 +1,124 @@
-from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth import login as auth_login, authenticate, logout
+import math
+import uuid
+
+from django.shortcuts import render, redirect, get_object_or_404, resolve_url
+from django.contrib.auth import login as auth_login, logout
 from django.contrib import messages
-from .forms import CreateUserForm, LoginForm, ClientForm, UserEditForm, UserProfileForm, AdminCreateUserForm, RecordForm
+from .forms import CreateUserForm, LoginForm, ClientForm, UserEditForm, UserProfileForm, AdminCreateUserForm, RecordForm, ImportForm, ExportFilterForm
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
 from django.contrib.auth.models import User
 from django.conf import settings
-from .models import Client, AccessRequest, Record
+from django.db import IntegrityError, transaction
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from .models import Client, AccessRequest, Job, Record
+from .concurrency import write_transaction
+from .conditional import conditional_page
+from .pagination import KeysetPaginator
+from .routers import read_alias, read_replica
+from .search import search_clients, search_records
+from . import bulk, counters, deletion, exporter, fragments, jobs, metrics, throttle
 
 # Create your views here.
 def home(request):
     return render(request, 'pages/index.html')
 
+def _users_paginator():
+    return KeysetPaginator(
+        User.objects.select_related('profile'), 'users',
+        sort_fields={'joined': 'date_joined', 'username': 'username', 'email': 'email'},
+        default_sort='-joined',
+    )
+
+def _clients_paginator():
+    return KeysetPaginator(
+        Client.objects.all(), 'clients',
+        sort_fields={'added': 'created_at', 'name': 'name', 'company': 'company', 'email': 'email'},
+        default_sort='-added',
+    )
+
+def _records_paginator():
+    return KeysetPaginator(
+        Record.objects.all(), 'records',
+        sort_fields={'added': 'created_at', 'title': 'title'},
+        default_sort='-added',
+    )
+
+# Paginators for the dashboard tables; also audited by `explain_queries`
+DASHBOARD_PAGINATORS = {
+    'users': _users_paginator,
+    'clients': _clients_paginator,
+    'records': _records_paginator,
+}
+
+def _recent_activity():
+    return [
+        {"title": f"Newest user: {u.username}", "time": u.date_joined.strftime('%Y-%m-%d')}
+        for u in User.objects.order_by('-date_joined')[:3]
+    ]
+
+def _pending_access():
+    pending = list(AccessRequest.objects.filter(status=AccessRequest.STATUS_PENDING).select_related('user'))
+    return {'pending_access': pending, 'pending_access_count': len(pending)}
+
+def _dashboard_fragments(request, user, params=None):
+    """Cached dashboard tables; each only queries and renders on a cache miss.
+
+    Each table is paginated independently with keyset cursors so a miss only
+    reads `size` rows no matter how large the tables grow. Tables vary on the
+    whole query string (``params``, by default the request's) because their
+    sort and pager links carry the other tables' cursors, and the users table
+    also on the viewer's role, which decides which role toggles are disabled.
+    """
+    params = request.GET if params is None else params
+    query = params.urlencode()
+    role = 'superuser' if user.is_superuser else 'staff'
+    parts = [
+        fragments.Fragment(
+            'users_table', 'components/users_table.html', [fragments.USERS],
+            lambda: {'users_page': _users_paginator().paginate(params)}, vary=(role, query),
+        ),
+        fragments.Fragment(
+            'clients_table', 'components/clients_table.html', [fragments.CLIENTS],
+            lambda: {'clients_page': _clients_paginator().paginate(params)}, vary=(query,),
+        ),
+        fragments.Fragment(
+            'records_table', 'components/records_table.html', [fragments.RECORDS],
+            lambda: {'records_page': _records_paginator().paginate(params)}, vary=(query,),
+        ),
+        fragments.Fragment(
+            'recent_activity', 'components/recent_activity.html', [fragments.USERS],
+            lambda: {'recent': _recent_activity()},
+        ),
+    ]
+    if user.is_superuser:
+        parts.append(fragments.Fragment(
+            'pending_access_table', 'components/pending_access_table.html', [fragments.ACCESS],
+            _pending_access,
+        ))
+    return parts
+
+def _dashboard_counts():
+    return counters.get_counts(
+        counters.USERS, counters.CLIENTS, counters.RECORDS, counters.PENDING_ACCESS,
+    )
+
+def _dashboard_context(user, counts):
+    stats = [
+        {"key": counters.USERS, "label": "Total Users", "value": counts[counters.USERS]},
+        {"key": counters.CLIENTS, "label": "Your Clients", "value": counts[counters.CLIENTS]},
+        {"key": counters.RECORDS, "label": "Total Records", "value": counts[counters.RECORDS]},
+    ]
+    context = {'stats': stats}
+    if user.is_superuser:
+        context['pending_access_count'] = counts[counters.PENDING_ACCESS]
+    return context
+
 @login_required(login_url='login')
+@read_replica
+@conditional_page
 def dashboard(request):
     if not request.user.is_staff:
         # Show access request page instead of redirect
@@ -20,30 +127,136 @@ def dashboard(request):
             'has_pending': bool(existing),
             'pending_request': existing,
         })
-    users = User.objects.all().order_by('-date_joined')
-    # Show all clients and records so you can manage any of them
-    clients = Client.objects.all().order_by('-created_at')
-    records = Record.objects.all().order_by('-created_at')
-    stats = [
-        {"label": "Total Users", "value": users.count()},
-        {"label": "Your Clients", "value": clients.count()},
-        {"label": "Total Records", "value": records.count()},
-    ]
-    recent = [
-        {"title": f"Newest user: {u.username}", "time": u.date_joined.strftime('%Y-%m-%d')} for u in users[:3]
-    ]
-    context = {
-        'stats': stats,
-        'recent': recent,
-        'users': users,
+    counts = _dashboard_counts()
+    context = _dashboard_context(request.user, counts)
+    context.update(fragments.render_fragments(request, _dashboard_fragments(request, request.user)))
+    return render(request, 'pages/dashboard.html', context)
+
+@login_required(login_url='login')
+@read_replica
+@conditional_page
+def search(request):
+    if not request.user.is_staff:
+        messages.error(request, 'This action is restricted to staff users.')
+        return redirect('home')
+    query = (request.GET.get('q') or '').strip()
+    clients = records = []
+    if query:
+        clients = search_clients(query)
+        records = search_records(query)
+    return render(request, 'pages/search.html', {
+        'query': query,
         'clients': clients,
         'records': records,
-    }
-    if request.user.is_superuser:
-        pending_access = AccessRequest.objects.filter(status=AccessRequest.STATUS_PENDING)
-        context['pending_access'] = pending_access
-        context['pending_access_count'] = pending_access.count()
-    return render(request, 'pages/dashboard.html', context)
+    })
+
+@login_required(login_url='login')
+def import_data(request):
+    if not request.user.is_staff:
+        messages.error(request, 'This action is restricted to staff users.')
+        return redirect('home')
+    if request.method == 'POST':
+        form = ImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            # Large files take a while to validate and insert, so the
+            # worker does it; the upload is kept where the worker can read it
+            fmt = form.cleaned_data['format']
+            name = f'imports/{uuid.uuid4().hex}.{fmt}'
+            with open(jobs.file_path(name), 'wb') as fh:
+                for chunk in form.cleaned_data['file'].chunks():
+                    fh.write(chunk)
+            job = jobs.enqueue('import', {
+                'kind': form.cleaned_data['kind'], 'format': fmt, 'file': name, 'owner': request.user.pk,
+            }, user=request.user)
+            messages.info(request, 'Import queued; this page shows its progress.')
+            return redirect('job_detail', pk=job.pk)
+    else:
+        form = ImportForm()
+    return render(request, 'pages/import_data.html', { 'form': form })
+
+@login_required(login_url='login')
+@read_replica
+def export_data(request, kind):
+    if not request.user.is_staff:
+        messages.error(request, 'This action is restricted to staff users.')
+        return redirect('home')
+    if kind not in exporter.EXPORTS:
+        raise Http404('Unknown export')
+    form = ExportFilterForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest(form.errors.as_text(), content_type='text/plain')
+    fmt = form.cleaned_data['format'] or 'csv'
+    if form.cleaned_data['background']:
+        job = jobs.enqueue('export', {
+            'kind': kind, 'format': fmt,
+            'since': form.cleaned_data['since'].isoformat() if form.cleaned_data['since'] else None,
+            'until': form.cleaned_data['until'].isoformat() if form.cleaned_data['until'] else None,
+            'created_by': form.cleaned_data['created_by'],
+        }, user=request.user)
+        return redirect('job_detail', pk=job.pk)
+    rows = exporter.export_queryset(
+        kind,
+        since=form.cleaned_data['since'],
+        until=form.cleaned_data['until'],
+        created_by=form.cleaned_data['created_by'],
+    )
+    if read_alias():
+        # The body streams after the view returns, outside read_replica
+        rows = rows.using(read_alias())
+    response = StreamingHttpResponse(exporter.stream_rows(kind, fmt, rows), content_type=exporter.FORMATS[fmt])
+    stamp = timezone.now().strftime('%Y%m%d-%H%M%S')
+    response['Content-Disposition'] = f'attachment; filename="{kind}-{stamp}.{fmt}"'
+    return response
+
+def prometheus_metrics(request):
+    # Staff can look in a browser; a scraper can send METRICS_TOKEN instead
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not (token and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')):
+        if not request.user.is_authenticated:
+            return redirect_to_login(request.get_full_path(), 'login')
+        if not request.user.is_staff:
+            messages.error(request, 'This action is restricted to staff users.')
+            return redirect('home')
+    return HttpResponse(metrics.REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def _visible_job(request, pk):
+    # Staff see the jobs they started; superusers see every job
+    qs = Job.objects.all() if request.user.is_superuser else Job.objects.filter(created_by=request.user)
+    return get_object_or_404(qs, pk=pk)
+
+@login_required(login_url='login')
+def job_detail(request, pk):
+    if not request.user.is_staff:
+        messages.error(request, 'This action is restricted to staff users.')
+        return redirect('home')
+    job = _visible_job(request, pk)
+    error = job.error.strip().splitlines()[-1] if job.error else ''
+    return render(request, 'pages/job.html', { 'job': job, 'error': error })
+
+@login_required(login_url='login')
+def job_retry(request, pk):
+    if request.method != 'POST':
+        return redirect('job_detail', pk=pk)
+    if not request.user.is_staff:
+        messages.error(request, 'This action is restricted to staff users.')
+        return redirect('home')
+    if jobs.retry(_visible_job(request, pk)):
+        messages.info(request, 'Job queued again.')
+    return redirect('job_detail', pk=pk)
+
+@login_required(login_url='login')
+def job_download(request, pk):
+    if not request.user.is_staff:
+        messages.error(request, 'This action is restricted to staff users.')
+        return redirect('home')
+    job = _visible_job(request, pk)
+    if job.kind != 'export' or job.status != Job.STATUS_SUCCEEDED:
+        raise Http404('No file for this job')
+    path = jobs.file_path(job.result['file'])
+    if not path.exists():
+        raise Http404('The export file is no longer available')
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=job.result['filename'],
+                        content_type=exporter.FORMATS[job.payload['format']])
 
 @login_required(login_url='login')
 def new_project(request):
@@ -98,6 +311,7 @@ def new_user(request):
     return render(request, 'pages/new_user.html', { 'form': form })
 
 @login_required(login_url='login')
+@write_transaction
 def new_client(request):
     if not request.user.is_staff:
         messages.error(request, 'This action is restricted to staff users.')
@@ -115,6 +329,7 @@ def new_client(request):
     return render(request, 'pages/new_client.html', { 'form': form })
 
 @login_required(login_url='login')
+@write_transaction
 def new_record(request):
     if not request.user.is_staff:
         messages.error(request, 'This action is restricted to staff users.')
@@ -132,6 +347,7 @@ def new_record(request):
     return render(request, 'pages/new_record.html', { 'form': form })
 
 @login_required(login_url='login')
+@write_transaction
 def edit_client(request, pk):
     if not request.user.is_staff:
         messages.error(request, 'This action is restricted to staff users.')
@@ -148,34 +364,54 @@ def edit_client(request, pk):
         form = ClientForm(instance=client)
     return render(request, 'pages/edit_client.html', { 'form': form, 'client': client })
 
+def _is_fetch(request):
+    return request.headers.get('X-Requested-With') == 'fetch'
+
+def _action_response(request, level, text, to='dashboard', status=200, leave=False, **data):
+    """Finish a dashboard row action.
+
+    The dashboard script posts with fetch and updates the row in place, so
+    it gets ``{ok, message, **data}`` as JSON, plus ``redirect`` when the
+    viewer has to ``leave`` the page. A plain form post gets the message
+    flashed and a redirect to ``to``.
+    """
+    if _is_fetch(request):
+        body = {'ok': status < 400, 'message': text, **data}
+        if leave:
+            body['redirect'] = resolve_url(to)
+        return JsonResponse(body, status=status)
+    messages.add_message(request, level, text)
+    return redirect(to)
+
 @login_required(login_url='login')
+@write_transaction
 def delete_client(request, pk):
     if not request.user.is_staff:
-        messages.error(request, 'This action is restricted to staff users.')
-        return redirect('home')
+        return _action_response(request, messages.ERROR, 'This action is restricted to staff users.',
+                                to='home', status=403, leave=True)
     # Allow deleting any client
     client = get_object_or_404(Client, pk=pk)
     if request.method == 'POST':
         name = client.name
         client.delete()
-        messages.success(request, f'Client "{name}" removed.')
-        return redirect('dashboard')
+        return _action_response(request, messages.SUCCESS, f'Client "{name}" removed.')
     return render(request, 'pages/delete_client.html', { 'client': client })
 
 @login_required(login_url='login')
+@write_transaction
 def delete_record(request, pk):
     if not request.user.is_staff:
-        messages.error(request, 'This action is restricted to staff users.')
-        return redirect('home')
+        return _action_response(request, messages.ERROR, 'This action is restricted to staff users.',
+                                to='home', status=403, leave=True)
     rec = get_object_or_404(Record, pk=pk)
     if request.method == 'POST':
         title = rec.title
         rec.delete()
-        messages.success(request, f'Record "{title}" removed.')
-        return redirect('dashboard')
+        return _action_response(request, messages.SUCCESS, f'Record "{title}" removed.')
     return render(request, 'pages/delete_record.html', { 'record': rec })
 
 @login_required(login_url='login')
+@write_transaction
 def edit_user(request, pk):
     if not request.user.is_staff:
         messages.error(request, 'This action is restricted to staff users.')
@@ -200,31 +436,39 @@ def edit_user(request, pk):
     return render(request, 'pages/edit_user.html', { 'form': form, 'usr': usr })
 
 @login_required(login_url='login')
+@write_transaction
 def delete_user(request, pk):
     if not request.user.is_staff:
-        messages.error(request, 'This action is restricted to staff users.')
-        return redirect('home')
+        return _action_response(request, messages.ERROR, 'This action is restricted to staff users.',
+                                to='home', status=403, leave=True)
     usr = get_object_or_404(User, pk=pk)
     if request.method == 'POST':
         username = usr.username
         # Protect superusers from admin deletion and prevent deleting the last superuser
         if usr.is_superuser:
             if not request.user.is_superuser:
-                messages.error(request, 'Only superusers can delete superusers.')
-                return redirect('dashboard')
+                return _action_response(request, messages.ERROR, 'Only superusers can delete superusers.', status=403)
             has_other_su = User.objects.filter(is_superuser=True).exclude(pk=usr.pk).exists()
             if not has_other_su:
-                messages.error(request, 'Cannot delete the last superuser.')
-                return redirect('dashboard')
-        usr.delete()
+                return _action_response(request, messages.ERROR, 'Cannot delete the last superuser.', status=409)
+        # Deleting cascades through every client and record the user owns,
+        # so the worker does it. Deactivating now signs the user out of
+        # every session and keeps them out until the row is gone.
+        usr.is_active = False
+        usr.save(update_fields=['is_active'])
+        payload = {'user_id': usr.pk, 'username': username}
+        if request.POST.get('reassign') and usr != request.user:
+            # Keep their clients and records, owned by whoever deleted them
+            payload['reassign_to'] = request.user.pk
+        job = jobs.enqueue('delete_user', payload, user=request.user)
         if usr == request.user or username == request.user.username:
-            messages.success(request, 'Your account was deleted. You have been logged out.')
             logout(request)
-            return redirect('login')
+            return _action_response(request, messages.SUCCESS, 'Your account is being deleted. You have been logged out.',
+                                    to='login', leave=True)
         else:
-            messages.success(request, f'User "{username}" removed.')
-            return redirect('dashboard')
-    return render(request, 'pages/delete_user.html', { 'usr': usr })
+            job_url = resolve_url('job_detail', pk=job.pk)
+            return _action_response(request, messages.SUCCESS, f'User "{username}" is being removed.', to=job_url, job=job_url)
+    return render(request, 'pages/delete_user.html', { 'usr': usr, 'owned': deletion.owned_counts(usr) })
 
 @login_required(login_url='login')
 def request_dashboard_access(request):
@@ -233,75 +477,81 @@ def request_dashboard_access(request):
         return redirect('dashboard')
     ar = AccessRequest.objects.filter(user=request.user, status=AccessRequest.STATUS_PENDING).first()
     if not ar:
-        ar = AccessRequest.objects.create(user=request.user, status=AccessRequest.STATUS_PENDING)
+        try:
+            with transaction.atomic():
+                ar = AccessRequest.objects.create(user=request.user, status=AccessRequest.STATUS_PENDING)
+        except IntegrityError:
+            # A concurrent submit won the one-pending-request-per-user constraint
+            return redirect('dashboard')
         messages.info(request, 'Access request submitted. An admin will review it shortly.')
     return redirect('dashboard')
 
+def _pending_count():
+    return counters.get_counts(counters.PENDING_ACCESS)[counters.PENDING_ACCESS]
+
 @login_required(login_url='login')
+@write_transaction
 def approve_access_request(request, pk):
     if request.method != 'POST':
         return redirect('dashboard')
     if not request.user.is_superuser:
-        messages.error(request, 'Only superusers can approve access requests.')
-        return redirect('dashboard')
-    ar = get_object_or_404(AccessRequest, pk=pk, status=AccessRequest.STATUS_PENDING)
+        return _action_response(request, messages.ERROR, 'Only superusers can approve access requests.', status=403)
+    ar = get_object_or_404(AccessRequest.objects.select_related('user'), pk=pk, status=AccessRequest.STATUS_PENDING)
     u = ar.user
     u.is_staff = True
     u.save(update_fields=['is_staff'])
     ar.status = AccessRequest.STATUS_APPROVED
-    from django.utils import timezone
     ar.responded_at = timezone.now()
-    ar.save(update_fields=['status','responded_at'])
-    messages.success(request, f'Granted dashboard access to {u.username}.')
-    return redirect('dashboard')
+    # auto_now only reaches the row when listed
+    ar.save(update_fields=['status', 'responded_at', 'updated_at'])
+    return _action_response(request, messages.SUCCESS, f'Granted dashboard access to {u.username}.',
+                            user=u.pk, is_staff=True, pending=_pending_count())
 
 @login_required(login_url='login')
+@write_transaction
 def deny_access_request(request, pk):
     if request.method != 'POST':
         return redirect('dashboard')
     if not request.user.is_superuser:
-        messages.error(request, 'Only superusers can deny access requests.')
-        return redirect('dashboard')
-    ar = get_object_or_404(AccessRequest, pk=pk, status=AccessRequest.STATUS_PENDING)
-    from django.utils import timezone
+        return _action_response(request, messages.ERROR, 'Only superusers can deny access requests.', status=403)
+    ar = get_object_or_404(AccessRequest.objects.select_related('user'), pk=pk, status=AccessRequest.STATUS_PENDING)
     ar.status = AccessRequest.STATUS_DENIED
     ar.responded_at = timezone.now()
-    ar.save(update_fields=['status','responded_at'])
-    messages.info(request, f'Denied dashboard access for {ar.user.username}.')
-    return redirect('dashboard')
+    ar.save(update_fields=['status', 'responded_at', 'updated_at'])
+    return _action_response(request, messages.INFO, f'Denied dashboard access for {ar.user.username}.',
+                            pending=_pending_count())
 
 @login_required(login_url='login')
+@write_transaction
 def toggle_user_staff(request, pk):
     if request.method != 'POST':
         return redirect('dashboard')
     # Only staff or superuser may toggle staff (and require staff access to dashboard)
     if not (request.user.is_staff or request.user.is_superuser):
-        messages.error(request, 'You do not have permission to change staff status.')
-        return redirect('dashboard')
+        return _action_response(request, messages.ERROR, 'You do not have permission to change staff status.', status=403)
     usr = get_object_or_404(User, pk=pk)
     values = request.POST.getlist('is_staff')
     new_is_staff = '1' in values
     was_staff = usr.is_staff
     # Staff cannot change staff flag for superusers
     if request.user.is_staff and not request.user.is_superuser and usr.is_superuser:
-        messages.error(request, 'Admins cannot modify superuser roles.')
-        return redirect('dashboard')
+        return _action_response(request, messages.ERROR, 'Admins cannot modify superuser roles.', status=403)
     usr.is_staff = new_is_staff
-    usr.save()
+    usr.save(update_fields=['is_staff'])
     if usr == request.user and getattr(settings, 'DASHBOARD_STAFF_ONLY', False) and was_staff and not new_is_staff:
-        messages.info(request, 'You removed your own staff access. Dashboard is staff-only; you have been redirected.')
-        return redirect('home')
-    messages.success(request, f'Updated staff status for "{usr.username}" to {"staff" if new_is_staff else "non-staff"}.')
-    return redirect('dashboard')
+        return _action_response(request, messages.INFO, 'You removed your own staff access. Dashboard is staff-only; you have been redirected.',
+                                to='home', leave=True)
+    return _action_response(request, messages.SUCCESS, f'Updated staff status for "{usr.username}" to {"staff" if new_is_staff else "non-staff"}.',
+                            user=usr.pk, is_staff=usr.is_staff, is_superuser=usr.is_superuser)
 
 @login_required(login_url='login')
+@write_transaction
 def toggle_user_superuser(request, pk):
     if request.method != 'POST':
         return redirect('dashboard')
     # Only superusers may toggle superuser
     if not request.user.is_superuser:
-        messages.error(request, 'Only superusers can change superuser status.')
-        return redirect('dashboard')
+        return _action_response(request, messages.ERROR, 'Only superusers can change superuser status.', status=403)
     usr = get_object_or_404(User, pk=pk)
     values = request.POST.getlist('is_superuser')
     new_is_su = '1' in values
@@ -309,31 +559,78 @@ def toggle_user_superuser(request, pk):
     if usr.is_superuser and not new_is_su:
         others = User.objects.filter(is_superuser=True).exclude(pk=usr.pk).exists()
         if not others:
-            messages.error(request, 'Cannot remove superuser status from the last superuser.')
-            return redirect('dashboard')
+            return _action_response(request, messages.ERROR, 'Cannot remove superuser status from the last superuser.', status=409)
     usr.is_superuser = new_is_su
     usr.is_staff = usr.is_staff or new_is_su  # superusers are implicitly staff
-    usr.save()
+    usr.save(update_fields=['is_superuser', 'is_staff'])
     # If self-demoted from superuser and dashboard is staff-only, still allowed as staff
-    messages.success(request, f'Updated superuser status for "{usr.username}" to {"superuser" if new_is_su else "standard"}.')
+    return _action_response(request, messages.SUCCESS, f'Updated superuser status for "{usr.username}" to {"superuser" if new_is_su else "standard"}.',
+                            user=usr.pk, is_staff=usr.is_staff, is_superuser=usr.is_superuser)
+
+@login_required(login_url='login')
+@write_transaction
+def bulk_action(request):
+    if request.method != 'POST':
+        return redirect('dashboard')
+    if not request.user.is_staff:
+        messages.error(request, 'This action is restricted to staff users.')
+        return redirect('home')
+    action = bulk.ACTIONS.get(request.POST.get('action'))
+    if action is None:
+        messages.error(request, 'Unknown bulk action.')
+        return redirect('dashboard')
+    handler, superuser_only, message = action
+    if superuser_only and not request.user.is_superuser:
+        messages.error(request, 'Only superusers can do that.')
+        return redirect('dashboard')
+    ids = [int(v) for v in request.POST.getlist('ids') if v.isdigit()]
+    if not ids:
+        messages.info(request, 'Select at least one row first.')
+        return redirect('dashboard')
+    try:
+        count = handler(request.user, ids)
+    except bulk.BulkActionError as exc:
+        messages.error(request, str(exc))
+        return redirect('dashboard')
+    if request.user.pk in ids:
+        request.user.refresh_from_db(fields=['is_staff', 'is_superuser'])
+    if not request.user.is_staff and getattr(settings, 'DASHBOARD_STAFF_ONLY', False):
+        messages.info(request, 'You removed your own staff access. Dashboard is staff-only; you have been redirected.')
+        return redirect('home')
+    messages.success(request, message.format(count=count))
     return redirect('dashboard')
 
+def _throttled(request, template_name, form, wait):
+    seconds = math.ceil(wait)
+    messages.error(request, f'Too many attempts. Please try again in {seconds} seconds.')
+    response = render(request, template_name, {'form': form}, status=429)
+    response['Retry-After'] = str(seconds)
+    return response
+
 def login(request):
     if request.method == 'POST':
+        username = request.POST.get('username', '')
+        # Rejected before the form runs, so a flood never reaches the hasher
+        wait = throttle.check('login', request, username)
+        if wait:
+            return _throttled(request, 'pages/login.html', LoginForm(), wait)
         form = LoginForm(request=request, data=request.POST)
         if form.is_valid():
-            username = form.cleaned_data.get('username')
-            password = form.cleaned_data.get('password')
-            user = authenticate(request, username=username, password=password)
-            if user is not None:
-                auth_login(request, user)
-                return redirect('home')
+            # AuthenticationForm has already authenticated the user while
+            # validating; calling authenticate() again would hash twice
+            throttle.login_succeeded(username)
+            auth_login(request, form.get_user())
+            return redirect('home')
+        throttle.login_failed(username)
     else:
         form = LoginForm()
     return render(request, 'pages/login.html', {'form': form})
 
 def register(request):
     if request.method == 'POST':
+        wait = throttle.check('register', request)
+        if wait:
+            return _throttled(request, 'pages/register.html', CreateUserForm(), wait)
         form = CreateUserForm(request.POST)
         if form.is_valid():
             form.save()
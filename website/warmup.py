@@ -0,0 +1,57 @@
+"""Do the per-process first-request work at startup instead.
+
+Django compiles a template the first time it is loaded, builds the URL
+resolver on the first ``reverse()``/``resolve()``, and crispy-forms loads
+its layout templates on the first form it renders. With the cached
+template loader all of that is kept for the life of the process, so doing
+it once in ``WebsiteConfig.ready()`` means the first request a fresh
+worker serves costs the same as any later one. Under a pre-forking server
+that loads the app before forking (e.g. ``gunicorn --preload``) the
+workers inherit the warm caches.
+"""
+from pathlib import Path
+
+from django.apps import apps
+from django.template import engines
+from django.urls import get_resolver
+
+
+def _template_names():
+    root = Path(apps.get_app_config('website').path) / 'templates'
+    # Components are included at render time, so compile them as well
+    for directory in ('pages', 'components'):
+        for path in sorted((root / directory).glob('*.html')):
+            yield f'{directory}/{path.name}'
+
+
+def templates():
+    for engine in engines.all():
+        for name in _template_names():
+            engine.get_template(name)
+
+
+def forms():
+    from crispy_forms.templatetags.crispy_forms_filters import as_crispy_form
+
+    from .forms import (
+        AdminCreateUserForm, ClientForm, CreateUserForm, ImportForm, LoginForm, RecordForm,
+        UserEditForm, UserProfileForm,
+    )
+    # Renders unbound forms: loads the crispy field templates and the
+    # widget templates of the form renderer without touching the database
+    for form_class in (
+        LoginForm, CreateUserForm, AdminCreateUserForm, ClientForm, RecordForm,
+        UserEditForm, UserProfileForm, ImportForm,
+    ):
+        as_crispy_form(form_class())
+
+
+def urls():
+    # Reading the reverse dict populates the resolver (and imports the views)
+    get_resolver().reverse_dict
+
+
+def warm_up():
+    templates()
+    forms()
+    urls()